@@ -1,21 +1,70 @@
+import time
+# Taken before anything else is imported, for --startup-time
+IMPORT_STARTED = time.perf_counter()
+
 import pygame
 import sys
 import random
 import math
-import json
 import datetime
+import argparse
+import colorsys
 from enum import Enum
+from collections import OrderedDict
+from array import array
 import os
+import bisect
+
+import simulation
+import storage
+import replay
+import catalog
+import profiler
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+# Start only the SDL subsystems the game uses: video (which brings events and the timer
+# with it) and fonts. pygame.init() would also start audio and joysticks, and there is
+# no sound in the game; on a machine without an audio device, mixer.init() even fails.
+def init_pygame(headless=False):
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.display.init()
+    pygame.font.init()
 
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 FPS = 60
 
+# Fixed-timestep simulation: the game advances in steps of SIM_DT seconds regardless of
+# how fast frames are drawn; FPS only caps rendering.
+SIM_RATE = 60
+SIM_DT = 1.0 / SIM_RATE
+MAX_FRAME_TIME = 0.25
+PIPE_INTERVAL_TICKS = simulation.PIPE_INTERVAL_TICKS
+
+SAVE_PATH = "flappy_bird_save.json"
+SAVE_DB_PATH = "sky_hopper.db"
+LEADERBOARD_SIZE = 10
+HISTORY_PAGE_SIZE = 8
+REPLAY_DIR = "replays"
+GHOST_ALPHA = 110
+TRACE_PATH = "sky_hopper_trace.json"
+SAVE_DEFAULTS = {
+    "highscore": 0,
+    "coins": 100,
+    "unlocked_skins": ["Classic Red"],
+    "equipped_skin": "Classic Red",
+    "background_theme": "DAY",
+    "trail_effect": "SPARKLE",
+    "game_speed": "NORMAL",
+    "ghost": False
+}
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -53,113 +102,761 @@ class GameSpeed(Enum):
     NORMAL = 2
     HARD = 3
 
-# Background themes
+PIPE_SPEEDS = {speed: simulation.PIPE_SPEEDS[speed.name] for speed in GameSpeed}
+PIPE_COLORS = [GREEN, BLUE, RED, PURPLE]
+
+# Background themes (how each one is drawn lives in BackgroundRenderer)
 class BackgroundTheme(Enum):
-    DAY = {"name": "Day Mode", "color": SKY_BLUE, "icon": "☀️"}
-    NIGHT = {"name": "Night Mode", "color": NIGHT_BLUE, "icon": "🌙"}
-    STORM = {"name": "Storm Mode", "color": DARK_BLUE, "icon": "⛈"}
+    DAY = 1
+    NIGHT = 2
+    STORM = 3
 
-# Trail effects
+# Trail effects (drawn by TrailRenderer)
 class TrailEffect(Enum):
-    NONE = {"name": "None", "color": None}
-    SPARKLE = {"name": "Sparkle", "color": WHITE}
-    FIRE = {"name": "Fire", "color": ORANGE}
-    RAINBOW = {"name": "Rainbow", "color": None}
-
-# Bird skins
-class BirdSkin(Enum):
-    RED = {"name": "Classic Red", "price": 30, "color": RED, "unlocked": True, "category": "Classic"}
-    GREEN = {"name": "Forest Green", "price": 50, "color": GREEN, "unlocked": False, "category": "Classic"}
-    YELLOW = {"name": "Sunshine Yellow", "price": 70, "color": YELLOW, "unlocked": False, "category": "Classic"}
-    PURPLE = {"name": "Mystic Purple", "price": 80, "color": PURPLE, "unlocked": False, "category": "Premium"}
-    BLUE = {"name": "Ocean Blue", "price": 90, "color": BLUE, "unlocked": False, "category": "Premium"}
-    GOLD = {"name": "Golden King", "price": 100, "color": GOLD, "unlocked": False, "category": "Premium"}
-    NEON_CYAN = {"name": "Neon Cyber", "price": 120, "color": CYAN, "unlocked": False, "category": "Special"}
-
-class ExplosionParticle:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.color = random.choice([RED, ORANGE, YELLOW, GREEN, BLUE, PURPLE, CYAN])
-        self.size = random.randint(5, 15)
-        self.speed_x = random.uniform(-5, 5)
-        self.speed_y = random.uniform(-5, 5)
-        self.lifetime = 60
-        self.max_lifetime = 60
-       
+    NONE = 0
+    SPARKLE = 1
+    FIRE = 2
+    RAINBOW = 3
+
+# Skins, and the theme and trail menu entries, come from the content manifest
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+content = catalog.Catalog.load(CATALOG_PATH)
+
+# Font sizes used by the menus and HUD, loaded up front so no screen stalls on its first frame
+FONT_PRELOAD = [
+    (None, 16), (None, 18), (None, 24), (None, 25), (None, 28), (None, 30), (None, 32),
+    (None, 35), (None, 36), (None, 40), (None, 50), (None, 60), (None, 80),
+]
+
+# Font registry: every font is created once and shared by key (family, size, bold, italic)
+class FontRegistry:
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, size, family=None, bold=False, italic=False):
+        key = (family, size, bold, italic)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(family, size, bold, italic)
+            self.fonts[key] = font
+        return font
+
+    def preload(self, specs):
+        for spec in specs:
+            self.get(spec[1], spec[0], *spec[2:])
+
+    def clear(self):
+        self.fonts.clear()
+
+fonts = FontRegistry()
+
+# Text surface cache: bounded LRU of rendered strings keyed by (font, text, color, antialias)
+class TextCache:
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surf
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.surfaces),
+                "hit_rate": self.hit_rate()}
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+text_cache = TextCache()
+
+# A text label that only re-renders when its value changes
+class Label:
+    def __init__(self, font, color, fmt="{}"):
+        self.font = font
+        self.color = color
+        self.fmt = fmt
+        self.value = None
+        self.surface = None
+        self.renders = 0
+
+    def set(self, value):
+        if value != self.value or self.surface is None:
+            self.value = value
+            self.surface = self.font.render(self.fmt.format(value), True, self.color)
+            self.renders += 1
+        return self.surface
+
+    def draw(self, screen, value, **anchor):
+        surf = self.set(value)
+        screen.blit(surf, surf.get_rect(**anchor))
+
+EXPLOSION_COLORS = [RED, ORANGE, YELLOW, GREEN, BLUE, PURPLE, CYAN]
+
+# Particle sprite shapes
+SHAPE_CIRCLE = 0
+SHAPE_GLOW = 1
+SHAPE_SPARKLE = 2
+
+# Pre-baked particle sprites: a flat disc, a soft radial glow or a four-point sparkle
+def make_particle_sprite(color, shape, size, alpha):
+    sprite = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+    center = (size, size)
+    if shape == SHAPE_GLOW:
+        for r in range(size, 0, -1):
+            t = 1 - r / size
+            glow = tuple(int(c + (255 - c) * t * 0.6) for c in color)
+            pygame.draw.circle(sprite, (*glow, int(alpha * (0.25 + 0.75 * t))), center, r)
+    elif shape == SHAPE_SPARKLE:
+        pygame.draw.line(sprite, (*color, alpha), (size, 0), (size, size * 2 - 1))
+        pygame.draw.line(sprite, (*color, alpha), (0, size), (size * 2 - 1, size))
+        pygame.draw.circle(sprite, (*color, alpha), center, max(1, size // 3))
+    else:
+        pygame.draw.circle(sprite, (*color, alpha), center, size)
+    # In the display's format the per-pixel alpha blit skips a conversion
+    return sprite.convert_alpha() if pygame.display.get_surface() is not None else sprite
+
+# Particle engine: particles live in preallocated columns (NumPy arrays when available,
+# array.array otherwise), dead slots are recycled through a free list and drawing
+# blits pre-tinted circle sprites cached per (color, size, alpha bucket).
+class ParticleSystem:
+    ALPHA_BUCKETS = 16
+
+    def __init__(self, capacity=16384, use_numpy=True):
+        self.capacity = capacity
+        self.use_numpy = use_numpy and np is not None
+        self.colors = []
+        self.color_ids = {}
+        self.sprites = {}
+        # NumPy path: each particle's (color, shape, size) has a dense id, set when it is
+        # emitted, and its sprite for alpha bucket b is sprite_table[id * ALPHA_BUCKETS + b]
+        self.sprite_ids = {}
+        self.sprite_combos = []
+        self.sprite_table = None
+        self.sprite_ready = None
+        self.count = 0
+        self.dropped = 0
+
+        if self.use_numpy:
+            self.rng = np.random.default_rng()
+            self.x = np.zeros(capacity, np.float32)
+            self.y = np.zeros(capacity, np.float32)
+            self.vx = np.zeros(capacity, np.float32)
+            self.vy = np.zeros(capacity, np.float32)
+            self.drag = np.ones(capacity, np.float32)
+            self.gravity = np.zeros(capacity, np.float32)
+            self.life = np.zeros(capacity, np.int32)
+            self.max_life = np.ones(capacity, np.int32)
+            self.size = np.zeros(capacity, np.int32)
+            self.color = np.zeros(capacity, np.int32)
+            self.shape = np.zeros(capacity, np.int32)
+            self.sprite_id = np.zeros(capacity, np.int32)
+            self.alive = np.zeros(capacity, np.bool_)
+            self.sprite_table = np.empty(0, object)
+            self.sprite_ready = np.zeros(0, np.bool_)
+        else:
+            self.x = array('f', bytes(4 * capacity))
+            self.y = array('f', bytes(4 * capacity))
+            self.vx = array('f', bytes(4 * capacity))
+            self.vy = array('f', bytes(4 * capacity))
+            self.drag = array('f', [1.0]) * capacity
+            self.gravity = array('f', bytes(4 * capacity))
+            self.life = array('i', bytes(4 * capacity))
+            self.max_life = array('i', [1]) * capacity
+            self.size = array('i', bytes(4 * capacity))
+            self.color = array('i', bytes(4 * capacity))
+            self.shape = array('i', bytes(4 * capacity))
+            self.active = []
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return self.count
+
+    def get_color_id(self, color):
+        color_id = self.color_ids.get(color)
+        if color_id is None:
+            color_id = len(self.colors)
+            self.colors.append(color)
+            self.color_ids[color] = color_id
+        return color_id
+
+    def emit(self, x, y, count, colors=EXPLOSION_COLORS, size_range=(5, 15), speed=5,
+             lifetime=60, drag=0.98, gravity=0.0, velocity=(0, 0), shape=SHAPE_CIRCLE):
+        if count > len(self.free):
+            self.dropped += count - len(self.free)
+            count = len(self.free)
+        if count <= 0:
+            return 0
+
+        slots = self.free[-count:]
+        del self.free[-count:]
+        color_ids = [self.get_color_id(c) for c in colors]
+        self.count += count
+
+        if self.use_numpy:
+            idx = np.array(slots, np.int64)
+            rng = self.rng
+            self.x[idx] = x
+            self.y[idx] = y
+            self.vx[idx] = rng.uniform(-speed, speed, count) + velocity[0]
+            self.vy[idx] = rng.uniform(-speed, speed, count) + velocity[1]
+            self.drag[idx] = drag
+            self.gravity[idx] = gravity
+            self.life[idx] = lifetime
+            self.max_life[idx] = lifetime
+            self.size[idx] = rng.integers(size_range[0], size_range[1] + 1, count)
+            self.color[idx] = rng.choice(color_ids, count)
+            self.shape[idx] = shape
+            combos = (self.color[idx] * 4 + shape) * 256 + self.size[idx]
+            unique_combos, inverse = np.unique(combos, return_inverse=True)
+            ids = np.array([self.get_sprite_id(combo) for combo in unique_combos.tolist()], np.int32)
+            self.sprite_id[idx] = ids[inverse]
+            self.alive[idx] = True
+        else:
+            for i in slots:
+                self.x[i] = x
+                self.y[i] = y
+                self.vx[i] = random.uniform(-speed, speed) + velocity[0]
+                self.vy[i] = random.uniform(-speed, speed) + velocity[1]
+                self.drag[i] = drag
+                self.gravity[i] = gravity
+                self.life[i] = lifetime
+                self.max_life[i] = lifetime
+                self.size[i] = random.randint(size_range[0], size_range[1])
+                self.color[i] = random.choice(color_ids)
+                self.shape[i] = shape
+            self.active.extend(slots)
+        return count
+
     def update(self):
-        self.x += self.speed_x
-        self.y += self.speed_y
-        self.lifetime -= 1
-        self.speed_x *= 0.98
-        self.speed_y *= 0.98
-       
+        if self.count == 0:
+            return
+
+        if self.use_numpy:
+            alive = self.alive
+            self.x += self.vx
+            self.y += self.vy
+            self.life -= 1
+            self.vy += self.gravity
+            self.vx *= self.drag
+            self.vy *= self.drag
+            died = alive & (self.life <= 0)
+            if died.any():
+                alive &= ~died
+                dead_slots = np.flatnonzero(died).tolist()
+                self.free.extend(dead_slots)
+                self.count -= len(dead_slots)
+        else:
+            x, y, vx, vy, life = self.x, self.y, self.vx, self.vy, self.life
+            drag, gravity = self.drag, self.gravity
+            still_active = []
+            for i in self.active:
+                x[i] += vx[i]
+                y[i] += vy[i]
+                life[i] -= 1
+                vy[i] += gravity[i]
+                vx[i] *= drag[i]
+                vy[i] *= drag[i]
+                if life[i] > 0:
+                    still_active.append(i)
+                else:
+                    self.free.append(i)
+            self.count = len(still_active)
+            self.active = still_active
+
+    def get_sprite_id(self, combo):
+        sprite_id = self.sprite_ids.get(combo)
+        if sprite_id is None:
+            sprite_id = self.sprite_ids[combo] = len(self.sprite_combos)
+            self.sprite_combos.append(combo)
+            buckets = self.ALPHA_BUCKETS
+            self.sprite_table = np.concatenate((self.sprite_table, np.empty(buckets, object)))
+            self.sprite_ready = np.concatenate((self.sprite_ready, np.zeros(buckets, np.bool_)))
+        return sprite_id
+
+    # Render the sprites for table slots that are needed but not drawn yet
+    def fill_sprite_table(self, keys):
+        for key in np.unique(keys).tolist():
+            sprite_id, bucket = divmod(key, self.ALPHA_BUCKETS)
+            color_shape, size = divmod(self.sprite_combos[sprite_id], 256)
+            color_id, shape = divmod(color_shape, 4)
+            self.sprite_table[key] = self.get_sprite((color_id, shape, size, bucket))
+            self.sprite_ready[key] = True
+
+    def get_sprite(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            color_id, shape, size, bucket = key
+            alpha = int(255 * (bucket + 1) / self.ALPHA_BUCKETS)
+            sprite = make_particle_sprite(self.colors[color_id], shape, size, alpha)
+            self.sprites[key] = sprite
+        return sprite
+
     def draw(self, screen):
-        if self.lifetime <= 0:
+        if self.count == 0:
             return
-           
-        alpha = int(255 * (self.lifetime / self.max_lifetime))
-        particle_surf = pygame.Surface((self.size * 2, self.size * 2), pygame.SRCALPHA)
-        pygame.draw.circle(particle_surf, (*self.color, alpha),
-                         (self.size, self.size), self.size)
-        screen.blit(particle_surf, (self.x - self.size, self.y - self.size))
-       
-    def is_alive(self):
-        return self.lifetime > 0
+        buckets = self.ALPHA_BUCKETS
+
+        if self.use_numpy:
+            width, height = screen.get_size()
+            x, y, size = self.x, self.y, self.size
+            visible = self.alive & (x > -size) & (x < width + size) & (y > -size) & (y < height + size)
+            idx = np.flatnonzero(visible)
+            if len(idx) == 0:
+                return
+            size = size[idx]
+            bucket = (self.life[idx] * buckets - 1) // self.max_life[idx]
+            keys = self.sprite_id[idx] * buckets + bucket
+            ready = self.sprite_ready[keys]
+            if not ready.all():
+                self.fill_sprite_table(keys[~ready])
+            # The (sprite, position) pairs are zipped in C rather than built in a Python loop
+            positions = np.empty((len(idx), 2), np.int32)
+            positions[:, 0] = self.x[idx] - size
+            positions[:, 1] = self.y[idx] - size
+            screen.blits(zip(self.sprite_table[keys].tolist(), positions.tolist()), doreturn=False)
+        else:
+            blits = []
+            for i in self.active:
+                size = self.size[i]
+                bucket = (self.life[i] * buckets - 1) // self.max_life[i]
+                sprite = self.get_sprite((self.color[i], self.shape[i], size, bucket))
+                blits.append((sprite, (int(self.x[i] - size), int(self.y[i] - size))))
+            screen.blits(blits, doreturn=False)
+
+    def clear(self):
+        if self.use_numpy:
+            self.alive[:] = False
+        else:
+            self.active = []
+        self.free = list(range(self.capacity - 1, -1, -1))
+        self.count = 0
+
+# Fixed-size ring buffer of the bird's recent heights, one entry per update
+class TrailRing:
+    def __init__(self, size=24):
+        self.size = size
+        self.ys = array('f', bytes(4 * size))
+        self.head = 0
+        self.length = 0
+
+    def push(self, y):
+        self.ys[self.head] = y
+        self.head = (self.head + 1) % self.size
+        if self.length < self.size:
+            self.length += 1
+
+    def recent(self):
+        # Newest first, paired with its age in updates
+        for age in range(self.length):
+            yield age, self.ys[(self.head - 1 - age) % self.size]
+
+    def clear(self):
+        self.head = 0
+        self.length = 0
+
+def build_hue_table(steps=64):
+    table = []
+    for i in range(steps):
+        r, g, b = colorsys.hsv_to_rgb(i / steps, 1.0, 1.0)
+        table.append((int(r * 255), int(g * 255), int(b * 255)))
+    return table
 
-class Button:
-    def __init__(self, x, y, width, height, text, color=BLUE, hover_color=(70, 170, 255)):
+# Draws the selected TrailEffect behind the bird. SPARKLE and FIRE feed pooled
+# particles into the shared ParticleSystem; RAINBOW draws a ribbon from the ring
+# buffer with colors from a precomputed hue table. Each effect emits at most
+# EMIT_BUDGET particles per update, so its live particle count stays bounded.
+class TrailRenderer:
+    EMIT_BUDGET = {"SPARKLE": 2, "FIRE": 3, "RAINBOW": 0, "NONE": 0}
+    HUE_STEPS = 64
+
+    def __init__(self, particles, length=24):
+        self.particles = particles
+        self.ring = TrailRing(length)
+        self.hue_table = build_hue_table(self.HUE_STEPS)
+        self.ribbon_sprites = {}
+        self.phase = 0
+        self.emitted = 0
+        self.blits = 0
+        self.cost_ms = 0.0
+
+    def reset(self):
+        self.ring.clear()
+        self.phase = 0
+
+    def update(self, effect, bird, scroll_speed):
+        start = time.perf_counter()
+        self.ring.push(bird.y)
+        self.phase = (self.phase + 1) % self.HUE_STEPS
+        budget = self.EMIT_BUDGET[effect.name]
+        tail_x = bird.x - bird.radius * 0.8
+
+        if effect == TrailEffect.SPARKLE:
+            self.emitted += self.particles.emit(
+                tail_x, bird.y + random.uniform(-bird.radius * 0.5, bird.radius * 0.5), budget,
+                colors=[WHITE, (255, 255, 180), (200, 230, 255)], size_range=(2, 5), speed=1,
+                lifetime=25, drag=0.95, velocity=(-scroll_speed, 0), shape=SHAPE_SPARKLE)
+        elif effect == TrailEffect.FIRE:
+            self.emitted += self.particles.emit(
+                tail_x, bird.y + bird.radius * 0.2, budget,
+                colors=[ORANGE, (255, 90, 20), YELLOW], size_range=(4, 8), speed=0.8,
+                lifetime=20, drag=0.96, gravity=-0.12, velocity=(-scroll_speed - 1, 0), shape=SHAPE_GLOW)
+        self.cost_ms = (time.perf_counter() - start) * 1000
+
+    def get_ribbon_sprite(self, hue, size):
+        key = (hue, size)
+        sprite = self.ribbon_sprites.get(key)
+        if sprite is None:
+            sprite = make_particle_sprite(self.hue_table[hue], SHAPE_CIRCLE, size, 170)
+            self.ribbon_sprites[key] = sprite
+        return sprite
+
+    def draw(self, screen, effect, bird, scroll_speed):
+        if effect != TrailEffect.RAINBOW:
+            return
+        start = time.perf_counter()
+        blits = []
+        base_x = bird.x - bird.radius * 0.6
+        length = self.ring.size
+        for age, y in self.ring.recent():
+            if age == 0:
+                continue
+            size = max(2, int(bird.radius * 0.45 * (1 - age / length)))
+            hue = (self.phase * 2 + age * 3) % self.HUE_STEPS
+            sprite = self.get_ribbon_sprite(hue, size)
+            blits.append((sprite, (int(base_x - age * scroll_speed) - size, int(y) - size)))
+        screen.blits(blits, doreturn=False)
+        self.blits = len(blits)
+        self.cost_ms += (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        return {"emitted": self.emitted, "blits": self.blits, "cost_ms": self.cost_ms}
+
+# Widgets are retained: each keeps the surfaces it has drawn, keyed by its visual
+# state, and only renders again when it is shown in a state it hasn't been drawn in.
+class Widget:
+    def __init__(self, x, y, width, height, on_click=None):
         self.rect = pygame.Rect(x, y, width, height)
+        self.on_click = on_click
+        self.hovered = False
+        self.surfaces = {}
+       
+    def state_key(self):
+        return self.hovered
+       
+    def render(self):
+        raise NotImplementedError
+       
+    def get_surface(self):
+        key = self.state_key()
+        surf = self.surfaces.get(key)
+        if surf is None:
+            surf = self.render()
+            if pygame.display.get_surface() is not None:
+                surf = surf.convert_alpha()
+            self.surfaces[key] = surf
+        return surf
+       
+    def draw(self, screen):
+        screen.blit(self.get_surface(), self.rect)
+       
+    def set_hovered(self, hovered):
+        self.hovered = hovered
+       
+    def click(self):
+        if self.on_click:
+            self.on_click()
+
+class Button(Widget):
+    def __init__(self, x, y, width, height, text, color=BLUE, hover_color=(70, 170, 255), on_click=None):
+        super().__init__(x, y, width, height, on_click)
         self.text = text
         self.color = color
         self.hover_color = hover_color
         self.current_color = color
-        self.font = pygame.font.SysFont(None, 36)
-        self.hovered = False
-       
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.current_color, self.rect, border_radius=10)
-        pygame.draw.rect(screen, WHITE, self.rect, 3, border_radius=10)
+        self.font = fonts.get(36)
+        # Outline color marking the current choice in a group, or None
+        self.selected = None
+       
+    def state_key(self):
+        return (self.hovered, self.selected)
+       
+    def render(self):
+        surf = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        local = surf.get_rect()
+        pygame.draw.rect(surf, self.current_color, local, border_radius=10)
+        pygame.draw.rect(surf, WHITE, local, 3, border_radius=10)
+        if self.selected:
+            pygame.draw.rect(surf, self.selected, local, 4, border_radius=15)
+           
+        text_surf = text_cache.render(self.font, self.text, WHITE)
+        surf.blit(text_surf, text_surf.get_rect(center=local.center))
+        return surf
        
-        text_surf = self.font.render(self.text, True, WHITE)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
+    def set_hovered(self, hovered):
+        self.hovered = hovered
+        self.current_color = self.hover_color if hovered else self.color
        
-    def update(self, mouse_pos):
-        self.hovered = self.rect.collidepoint(mouse_pos)
-        self.current_color = self.hover_color if self.hovered else self.color
-        return self.hovered
-   
-    def is_clicked(self, mouse_pos, mouse_click):
-        if self.rect.collidepoint(mouse_pos) and mouse_click:
-            return True
-        return False
 
-class ToggleButton:
-    def __init__(self, x, y, width, height, options, initial_index=0):
-        self.rect = pygame.Rect(x, y, width, height)
+class ToggleButton(Widget):
+    def __init__(self, x, y, width, height, options, initial_index=0, on_click=None):
+        super().__init__(x, y, width, height, on_click)
         self.options = options
         self.current_index = initial_index
-        self.font = pygame.font.SysFont(None, 32)
+        self.font = fonts.get(32)
        
-    def draw(self, screen):
-        pygame.draw.rect(screen, DARK_BLUE, self.rect, border_radius=10)
-        pygame.draw.rect(screen, WHITE, self.rect, 2, border_radius=10)
+    def state_key(self):
+        return self.current_index
+       
+    def render(self):
+        surf = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        local = surf.get_rect()
+        pygame.draw.rect(surf, DARK_BLUE, local, border_radius=10)
+        pygame.draw.rect(surf, WHITE, local, 2, border_radius=10)
        
         text = f"{self.options[self.current_index]}"
-        text_surf = self.font.render(text, True, WHITE)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
+        text_surf = text_cache.render(self.font, text, WHITE)
+        surf.blit(text_surf, text_surf.get_rect(center=local.center))
+        return surf
        
-    def update(self, mouse_pos, mouse_click):
-        if self.rect.collidepoint(mouse_pos) and mouse_click:
-            self.current_index = (self.current_index + 1) % len(self.options)
-            return True
-        return False
+    def click(self):
+        self.current_index = (self.current_index + 1) % len(self.options)
+        super().click()
+
+# The widget tree of one screen. Widgets are also bucketed into a coarse grid, so the
+# widget under the pointer is found by checking one cell instead of every widget.
+class WidgetScreen:
+    CELL = 100
+   
+    def __init__(self, widgets=()):
+        self.widgets = []
+        self.grid = {}
+        self.hovered = None
+        for widget in widgets:
+            self.add(widget)
+           
+    def add(self, widget):
+        self.widgets.append(widget)
+        rect = widget.rect
+        for cx in range(rect.left // self.CELL, (rect.right - 1) // self.CELL + 1):
+            for cy in range(rect.top // self.CELL, (rect.bottom - 1) // self.CELL + 1):
+                self.grid.setdefault((cx, cy), []).append(widget)
+               
+    # Later widgets are drawn on top, so they win where widgets overlap
+    def widget_at(self, pos):
+        for widget in reversed(self.grid.get((pos[0] // self.CELL, pos[1] // self.CELL), ())):
+            if widget.rect.collidepoint(pos):
+                return widget
+        return None
+   
+    def pointer(self, pos):
+        widget = self.widget_at(pos)
+        if widget is not self.hovered:
+            if self.hovered:
+                self.hovered.set_hovered(False)
+            if widget:
+                widget.set_hovered(True)
+            self.hovered = widget
+           
+    def click(self, pos):
+        widget = self.widget_at(pos)
+        if widget:
+            widget.click()
+        return widget
+   
+    def clear_hover(self):
+        if self.hovered:
+            self.hovered.set_hovered(False)
+            self.hovered = None
+           
+    def draw(self, screen):
+        for widget in self.widgets:
+            widget.draw(screen)
+
+# One card of the skin selector. Its face (ring, lock, name and price or status) is
+# cached per state; only the flapping bird preview is drawn over it each frame.
+class SkinCard(Widget):
+    SIZE = 140
+    RADIUS = 50
+   
+    def __init__(self, skin, grid, x, y):
+        super().__init__(x, y, self.SIZE, self.SIZE)
+        self.skin = skin
+        self.grid = grid
+       
+    def state_key(self):
+        if self.skin == self.grid.equipped:
+            return "equipped"
+        return "owned" if self.skin.name in self.grid.owned else "locked"
+   
+    def render(self):
+        surf = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        center = (self.SIZE // 2, self.SIZE // 2)
+        radius = self.RADIUS
+        state = self.state_key()
+       
+        if state == "equipped":
+            for r in range(radius, radius + 8):
+                pygame.draw.circle(surf, GOLD, center, r, 2)
+        else:
+            pygame.draw.circle(surf, GREEN if state == "owned" else GRAY, center, radius + 4, 3)
+        pygame.draw.circle(surf, DARK_GRAY, center, radius)
+       
+        if state == "locked":
+            lock_surf = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(lock_surf, (0, 0, 0, 150), (radius, radius), radius)
+            surf.blit(lock_surf, (center[0] - radius, center[1] - radius))
+            lock_text = text_cache.render(fonts.get(40), "🔒", WHITE)
+            surf.blit(lock_text, (55, 55))
+           
+        name_text = text_cache.render(fonts.get(18), self.skin.name, WHITE)
+        surf.blit(name_text, (center[0] - name_text.get_width() // 2, 110))
+       
+        status_font = fonts.get(16)
+        if state == "equipped":
+            status_text = text_cache.render(status_font, "EQUIPPED", GREEN)
+        elif state == "owned":
+            status_text = text_cache.render(status_font, "OWNED", CYAN)
+        else:
+            status_text = text_cache.render(status_font, f"{self.skin.price} coins", YELLOW)
+        surf.blit(status_text, (center[0] - status_text.get_width() // 2, 125))
+        return surf
+
+# Layout of the skin selector, computed once for the catalog: category headers, rows of
+# cards and separators as one table of lines sorted by their y in the scrolled content.
+# Drawing and hit-testing bisect that table, so they only touch the lines in view no
+# matter how many skins there are.
+class SkinGrid:
+    COLUMNS = 3
+    COLUMN_WIDTH = 200
+    HEADER_HEIGHT = 35
+    SEPARATOR_HEIGHT = 30
+    SCROLL_STEP = 70
+    CATEGORY_COLORS = {"Special": CYAN, "Premium": GOLD}
+   
+    def __init__(self, viewport, skins):
+        self.viewport = pygame.Rect(viewport)
+        # Names of the skins the current profile owns, and the one it wears
+        self.owned = set()
+        self.equipped = None
+        self.scroll = 0
+        self.cards = []
+        # (top, height, kind, payload) with kind "header", "cards" or "separator"
+        self.lines = []
+       
+        categories = {}
+        for skin in skins:
+            categories.setdefault(skin.category, []).append(skin)
+           
+        y = 0
+        for category, members in categories.items():
+            if self.lines:
+                self.lines.append((y, self.SEPARATOR_HEIGHT, "separator", None))
+                y += self.SEPARATOR_HEIGHT
+            self.lines.append((y, self.HEADER_HEIGHT, "header", category))
+            y += self.HEADER_HEIGHT
+            for start in range(0, len(members), self.COLUMNS):
+                row = [SkinCard(skin, self, col * self.COLUMN_WIDTH, y)
+                       for col, skin in enumerate(members[start:start + self.COLUMNS])]
+                self.cards.extend(row)
+                self.lines.append((y, SkinCard.SIZE, "cards", row))
+                y += SkinCard.SIZE
+               
+        self.tops = [line[0] for line in self.lines]
+        self.content_height = y
+        self.max_scroll = max(0, y - self.viewport.height)
+       
+    def scroll_by(self, dy):
+        scroll = min(max(self.scroll + dy, 0), self.max_scroll)
+        changed = scroll != self.scroll
+        self.scroll = scroll
+        return changed
+   
+    def visible_lines(self):
+        first = max(0, bisect.bisect_right(self.tops, self.scroll) - 1)
+        last = bisect.bisect_left(self.tops, self.scroll + self.viewport.height)
+        return self.lines[first:last]
+   
+    def card_screen_rect(self, card):
+        return card.rect.move(self.viewport.x, self.viewport.y - self.scroll)
+   
+    # Screen rects of the cards in view, clipped to the viewport
+    def visible_card_rects(self):
+        return [self.card_screen_rect(card).clip(self.viewport)
+                for _, _, kind, row in self.visible_lines() if kind == "cards" for card in row]
+   
+    # The card whose circle is under pos: one bisect for the row, one division for the column
+    def card_at(self, pos):
+        if not self.viewport.collidepoint(pos):
+            return None
+        x = pos[0] - self.viewport.x
+        y = pos[1] - self.viewport.y + self.scroll
+        index = bisect.bisect_right(self.tops, y) - 1
+        if index < 0 or self.lines[index][2] != "cards":
+            return None
+        row = self.lines[index][3]
+        col = x // self.COLUMN_WIDTH
+        if col >= len(row):
+            return None
+        card = row[col]
+        dx, dy = x - card.rect.centerx, y - card.rect.centery
+        return card if dx * dx + dy * dy < SkinCard.RADIUS * SkinCard.RADIUS else None
+   
+    def draw(self, screen, flap_index):
+        clip = screen.get_clip()
+        screen.set_clip(self.viewport.clip(clip))
+        ox, oy = self.viewport.x, self.viewport.y - self.scroll
+       
+        for top, height, kind, payload in self.visible_lines():
+            if kind == "header":
+                color = self.CATEGORY_COLORS.get(payload, GREEN)
+                screen.blit(text_cache.render(fonts.get(28), f"{payload} Skins", color), (ox, oy + top))
+            elif kind == "separator":
+                line_y = oy + top + height // 2
+                pygame.draw.line(screen, GRAY, (ox, line_y), (ox + self.viewport.width, line_y), 2)
+            else:
+                for card in payload:
+                    rect = card.rect.move(ox, oy)
+                    screen.blit(card.get_surface(), rect)
+                    frame = bird_atlas.frame(card.skin, 30, flap_index, preview=True)
+                    screen.blit(frame, frame.get_rect(center=rect.center))
+                   
+        if self.max_scroll:
+            track = pygame.Rect(self.viewport.right - 6, self.viewport.y, 6, self.viewport.height)
+            thumb_height = max(30, track.height * self.viewport.height // self.content_height)
+            thumb_y = track.y + (track.height - thumb_height) * self.scroll // self.max_scroll
+            pygame.draw.rect(screen, DARK_GRAY, track, border_radius=3)
+            pygame.draw.rect(screen, LIGHT_GRAY, (track.x, thumb_y, track.width, thumb_height), border_radius=3)
+        screen.set_clip(clip)
 
 class BackgroundRenderer:
+    CLOUD_COLORS = {
+        "DAY": (255, 255, 255, 150),
+        "NIGHT": (100, 100, 150, 80),
+        "STORM": (50, 50, 70, 120),
+    }
+
     def __init__(self):
         self.theme = BackgroundTheme.DAY
+        # Static layers and cloud sprites, built lazily per (theme, screen size)
+        self.layers = {}
         self.clouds = []
         self.stars = []
         self.rain_particles = []
@@ -206,170 +903,466 @@ class BackgroundRenderer:
                     self.lightning_timer = 10
                     self.lightning_alpha = 150
    
-    def draw(self, screen):
+    def get_layers(self, size):
+        key = (self.theme, size)
+        layers = self.layers.get(key)
+        if layers is None:
+            layers = self.build_layers(size)
+            self.layers[key] = layers
+        return layers
+
+    def build_layers(self, size):
+        width, height = size
+        sky = pygame.Surface(size)
         if self.theme == BackgroundTheme.DAY:
-            screen.fill(SKY_BLUE)
-           
-            pygame.draw.circle(screen, YELLOW, (100, 80), 40)
-           
-            for cloud in self.clouds:
-                for j in range(3):
-                    circle_x = cloud['x'] + j * 25
-                    circle_y = cloud['y'] + (j % 2) * 15
-                    cloud_surf = pygame.Surface((cloud['size'] * 2, cloud['size'] * 2), pygame.SRCALPHA)
-                    pygame.draw.circle(cloud_surf, (255, 255, 255, 150),
-                                     (cloud['size'], cloud['size']), cloud['size'])
-                    screen.blit(cloud_surf, (circle_x - cloud['size'], circle_y - cloud['size']))
-                   
+            sky.fill(SKY_BLUE)
+            pygame.draw.circle(sky, YELLOW, (100, 80), 40)
         elif self.theme == BackgroundTheme.NIGHT:
-            screen.fill(NIGHT_BLUE)
-           
-            pygame.draw.circle(screen, SILVER, (SCREEN_WIDTH - 100, 80), 35)
-            pygame.draw.circle(screen, NIGHT_BLUE, (SCREEN_WIDTH - 85, 65), 25)
-           
+            sky.fill(NIGHT_BLUE)
+            pygame.draw.circle(sky, SILVER, (width - 100, 80), 35)
+            pygame.draw.circle(sky, NIGHT_BLUE, (width - 85, 65), 25)
+        else:
+            sky.fill(DARK_BLUE)
+
+        ground = pygame.Surface((width, 100))
+        ground.fill((100, 70, 30))
+        pygame.draw.rect(ground, (80, 150, 50), (0, 0, width, 20))
+
+        flash = pygame.Surface(size)
+        flash.fill((255, 255, 200))
+
+        if pygame.display.get_surface() is not None:
+            sky = sky.convert()
+            ground = ground.convert()
+            flash = flash.convert()
+
+        return {"sky": sky, "ground": ground, "flash": flash, "clouds": {}}
+
+    def get_cloud_sprite(self, layers, size):
+        sprite = layers["clouds"].get(size)
+        if sprite is None:
+            puff = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+            pygame.draw.circle(puff, self.CLOUD_COLORS[self.theme.name], (size, size), size)
+            sprite = pygame.Surface((size * 2 + 50, size * 2 + 15), pygame.SRCALPHA)
+            for j in range(3):
+                sprite.blit(puff, (j * 25, (j % 2) * 15))
+            layers["clouds"][size] = sprite
+        return sprite
+
+    def clear_cache(self):
+        self.layers.clear()
+
+    def draw(self, screen):
+        size = screen.get_size()
+        layers = self.get_layers(size)
+        screen.blit(layers["sky"], (0, 0))
+
+        if self.theme == BackgroundTheme.NIGHT:
             for star in self.stars:
                 brightness = int(star['brightness'] * 255)
                 pygame.draw.circle(screen, (brightness, brightness, 200),
                                  (int(star['x']), int(star['y'])), star['size'])
-               
-            for cloud in self.clouds:
-                for j in range(3):
-                    circle_x = cloud['x'] + j * 25
-                    circle_y = cloud['y'] + (j % 2) * 15
-                    cloud_surf = pygame.Surface((cloud['size'] * 2, cloud['size'] * 2), pygame.SRCALPHA)
-                    pygame.draw.circle(cloud_surf, (100, 100, 150, 80),
-                                     (cloud['size'], cloud['size']), cloud['size'])
-                    screen.blit(cloud_surf, (circle_x - cloud['size'], circle_y - cloud['size']))
-                   
-        elif self.theme == BackgroundTheme.STORM:
-            screen.fill(DARK_BLUE)
-           
-            for cloud in self.clouds:
-                for j in range(3):
-                    circle_x = cloud['x'] + j * 25
-                    circle_y = cloud['y'] + (j % 2) * 15
-                    cloud_surf = pygame.Surface((cloud['size'] * 2, cloud['size'] * 2), pygame.SRCALPHA)
-                    pygame.draw.circle(cloud_surf, (50, 50, 70, 120),
-                                     (cloud['size'], cloud['size']), cloud['size'])
-                    screen.blit(cloud_surf, (circle_x - cloud['size'], circle_y - cloud['size']))
-           
-            if self.lightning_alpha > 0:
-                lightning_surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-                lightning_surf.fill((255, 255, 200, self.lightning_alpha))
-                screen.blit(lightning_surf, (0, 0))
-       
-        ground_color = (100, 70, 30)
-        grass_color = (80, 150, 50)
-       
-        pygame.draw.rect(screen, ground_color,
-                        (0, SCREEN_HEIGHT - 100, SCREEN_WIDTH, 100))
-        pygame.draw.rect(screen, grass_color,
-                        (0, SCREEN_HEIGHT - 100, SCREEN_WIDTH, 20))
-
-class Bird:
-    def __init__(self, x, y, skin=BirdSkin.RED):
-        self.x = x
-        self.y = y
-        self.velocity = 0
-        self.gravity = 0.5
-        self.jump_strength = -10
-        self.radius = 20
-        self.alive = True
-        self.skin = skin
-        self.flap_frame = 0
-        self.flap_speed = 0.2
-        self.angle = 0
-       
-    def update(self):
-        self.velocity += self.gravity
-        self.y += self.velocity
-       
-        self.angle = min(max(self.velocity * 3, -30), 90)
-       
-        self.flap_frame += self.flap_speed
-        if self.flap_frame >= 3:
-            self.flap_frame = 0
-           
-        if self.y < 0:
-            self.y = 0
-            self.velocity = 0
-           
-    def jump(self):
-        self.velocity = self.jump_strength
-       
-    def draw(self, screen):
-        bird_color = self.skin.value["color"]
-       
-        pygame.draw.circle(screen, bird_color, (int(self.x), int(self.y)), int(self.radius))
-       
-        pygame.draw.circle(screen, WHITE, (int(self.x + self.radius * 0.5), int(self.y - self.radius * 0.3)), int(self.radius * 0.3))
-        pygame.draw.circle(screen, BLACK, (int(self.x + self.radius * 0.5), int(self.y - self.radius * 0.3)), int(self.radius * 0.15))
-       
-        beak_points = [
-            (self.x + self.radius * 0.8, self.y),
-            (self.x + self.radius * 1.5, self.y),
-            (self.x + self.radius * 0.8, self.y + self.radius * 0.5)
-        ]
-        pygame.draw.polygon(screen, ORANGE, beak_points)
-       
-        wing_y_offset = math.sin(self.flap_frame) * 5
+
+        for cloud in self.clouds:
+            sprite = self.get_cloud_sprite(layers, cloud['size'])
+            screen.blit(sprite, (cloud['x'] - cloud['size'], cloud['y'] - cloud['size']))
+
+        if self.theme == BackgroundTheme.STORM and self.lightning_alpha > 0:
+            flash = layers["flash"]
+            flash.set_alpha(self.lightning_alpha)
+            screen.blit(flash, (0, 0))
+
+        screen.blit(layers["ground"], (0, size[1] - 100))
+
+# Pre-baked bird sprites. Each (skin, size, style) gets one atlas surface holding
+# FLAP_FRAMES rows of wing positions by one column per quantized rotation angle,
+# built the first time that skin is drawn.
+class BirdAtlas:
+    FLAP_FRAMES = 8
+    ANGLE_STEP = 10
+    MIN_ANGLE = -30
+    MAX_ANGLE = 90
+
+    # Shape of the bird relative to its radius: the in-game bird and the skin preview differ slightly
+    STYLES = {
+        False: {"eye_x": 0.5, "beak": ((0.8, 0), (1.5, 0), (0.8, 0.5)), "wing_tip": -0.8,
+                "wing_amplitude": 5, "flap_cycle": 3, "wing_over_beak": True},
+        True: {"eye_x": 0.4, "beak": ((0.8, 0), (1.2, 0), (0.8, 0.4)), "wing_tip": -0.7,
+               "wing_amplitude": 3, "flap_cycle": 2 * math.pi, "wing_over_beak": False},
+    }
+
+    def __init__(self):
+        self.sheets = {}
+        self.angles = list(range(self.MIN_ANGLE, self.MAX_ANGLE + 1, self.ANGLE_STEP))
+
+    # A skin with an image is drawn from its color until the image has been decoded
+    def get_sheet(self, skin, radius, preview=False):
+        image = assets.get(skin.image) if skin.image else None
+        key = (skin.key, radius, preview, image is not None)
+        sheet = self.sheets.get(key)
+        if sheet is None:
+            sheet = self.build_sheet(skin.color, radius, preview, image)
+            self.sheets[key] = sheet
+        return sheet
+
+    def draw_bird(self, color, radius, flap_index, preview, image=None):
+        style = self.STYLES[preview]
+        half = int(radius * 1.6) + style["wing_amplitude"] + 2
+        surf = pygame.Surface((half * 2, half * 2), pygame.SRCALPHA)
+        cx = cy = half
+       
+        if image is not None:
+            scale = radius * 2 / max(image.get_size())
+            size = (max(1, int(image.get_width() * scale)), max(1, int(image.get_height() * scale)))
+            smooth = image.get_bitsize() >= 24
+            body = pygame.transform.smoothscale(image, size) if smooth else pygame.transform.scale(image, size)
+            surf.blit(body, body.get_rect(center=(cx, cy)))
+            return surf
+
+        pygame.draw.circle(surf, color, (cx, cy), radius)
+        eye = (int(cx + radius * style["eye_x"]), int(cy - radius * 0.3))
+        pygame.draw.circle(surf, WHITE, eye, int(radius * 0.3))
+        pygame.draw.circle(surf, BLACK, eye, int(radius * 0.15))
+
+        beak_points = [(cx + radius * bx, cy + radius * by) for bx, by in style["beak"]]
+        phase = flap_index * style["flap_cycle"] / self.FLAP_FRAMES
+        wing_y_offset = math.sin(phase) * style["wing_amplitude"]
         wing_points = [
-            (self.x - self.radius * 0.5, self.y),
-            (self.x - self.radius * 0.8, self.y + self.radius * 0.5 + wing_y_offset),
-            (self.x, self.y + self.radius * 0.3)
+            (cx - radius * 0.5, cy),
+            (cx + radius * style["wing_tip"], cy + radius * 0.5 + wing_y_offset),
+            (cx, cy + radius * 0.3)
         ]
-        pygame.draw.polygon(screen, (bird_color[0]//2, bird_color[1]//2, bird_color[2]//2), wing_points)
-               
-    def get_rect(self):
-        return pygame.Rect(self.x - self.radius, self.y - self.radius,
-                          self.radius * 2, self.radius * 2)
-
-class Pipe:
-    def __init__(self, x, gap_y, game_speed):
-        self.x = x
-        self.gap_y = gap_y
-        self.gap_height = 150
-        self.width = 80
-        self.speed = 3 if game_speed == GameSpeed.NORMAL else 2 if game_speed == GameSpeed.EASY else 4
-        self.passed = False
-        self.color = random.choice([GREEN, BLUE, RED, PURPLE])
+        wing_color = (color[0]//2, color[1]//2, color[2]//2)
+        if style["wing_over_beak"]:
+            pygame.draw.polygon(surf, ORANGE, beak_points)
+            pygame.draw.polygon(surf, wing_color, wing_points)
+        else:
+            pygame.draw.polygon(surf, wing_color, wing_points)
+            pygame.draw.polygon(surf, ORANGE, beak_points)
+        return surf
+
+    def build_sheet(self, color, radius, preview, image=None):
+        angles = [0] if preview else self.angles
+        sprites = [self.draw_bird(color, radius, i, preview, image) for i in range(self.FLAP_FRAMES)]
+        # Leave room for the sprite's diagonal so no rotation gets clipped
+        cell = int(math.ceil(sprites[0].get_width() * 1.42))
+        surface = pygame.Surface((cell * len(angles), cell * self.FLAP_FRAMES), pygame.SRCALPHA)
+
+        for row, sprite in enumerate(sprites):
+            for col, angle in enumerate(angles):
+                rotated = pygame.transform.rotozoom(sprite, -angle, 1) if angle else sprite
+                surface.blit(rotated, rotated.get_rect(center=(col * cell + cell // 2, row * cell + cell // 2)))
+
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+
+        frames = [[surface.subsurface((col * cell, row * cell, cell, cell)) for col in range(len(angles))]
+                  for row in range(self.FLAP_FRAMES)]
+        return {"surface": surface, "frames": frames, "cell": cell}
+
+    def angle_index(self, angle):
+        index = int(round((angle - self.MIN_ANGLE) / self.ANGLE_STEP))
+        return min(max(index, 0), len(self.angles) - 1)
+
+    # ghost=True gives the same pixels through a second set of subsurfaces with a
+    # surface alpha, so the ghost never changes how the live bird's frames draw
+    def frame(self, skin, radius, flap_index, angle=0, preview=False, ghost=False):
+        sheet = self.get_sheet(skin, radius, preview)
+        frames = sheet["frames"]
+        if ghost:
+            frames = sheet.get("ghost_frames")
+            if frames is None:
+                frames = [[cell.subsurface(cell.get_rect()) for cell in row] for row in sheet["frames"]]
+                for row in frames:
+                    for cell in row:
+                        cell.set_alpha(GHOST_ALPHA)
+                sheet["ghost_frames"] = frames
+        row = frames[flap_index % self.FLAP_FRAMES]
+        return row[0] if preview else row[self.angle_index(angle)]
+
+    def clear(self):
+        self.sheets.clear()
+
+bird_atlas = BirdAtlas()
+
+# Skin images are decoded off the main thread and converted on first use
+def prepare_image(image):
+    return image.convert_alpha() if pygame.display.get_surface() is not None else image
+
+assets = catalog.AssetLoader(pygame.image.load, prepare_image)
+
+class Bird(simulation.Bird):
+    def __init__(self, x, y, skin=None, **physics):
+        super().__init__(x, y, **physics)
+        self.skin = skin or content.starter
        
-    def update(self):
-        self.x -= self.speed
-               
-    def draw(self, screen):
+    def flap_index(self):
+        return int(self.flap_frame / 3 * BirdAtlas.FLAP_FRAMES) % BirdAtlas.FLAP_FRAMES
+
+    def draw(self, screen, alpha=1.0, ghost=False):
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        frame = bird_atlas.frame(self.skin, self.radius, self.flap_index(), self.angle, ghost=ghost)
+        screen.blit(frame, frame.get_rect(center=(int(self.x), int(y))))
+
+class Pipe(simulation.Pipe):
+    def __init__(self, x, gap_y, speed, gap_height=simulation.PIPE_GAP, width=simulation.PIPE_WIDTH, variant=0):
+        super().__init__(x, gap_y, speed, gap_height, width, variant)
+        self.color = PIPE_COLORS[variant % len(PIPE_COLORS)]
+       
+    def draw(self, screen, alpha=1.0):
+        x = self.prev_x + (self.x - self.prev_x) * alpha
         top_pipe_height = self.gap_y
         bottom_pipe_y = self.gap_y + self.gap_height
        
-        top_rect = pygame.Rect(self.x, 0, self.width, top_pipe_height)
+        top_rect = pygame.Rect(x, 0, self.width, top_pipe_height)
         pygame.draw.rect(screen, self.color, top_rect)
         pygame.draw.rect(screen, (self.color[0]//2, self.color[1]//2, self.color[2]//2),
                         top_rect, 3)
        
-        cap_rect = pygame.Rect(self.x - 5, top_pipe_height - 20,
+        cap_rect = pygame.Rect(x - 5, top_pipe_height - 20,
                               self.width + 10, 20)
         pygame.draw.rect(screen, (self.color[0]//2, self.color[1]//2, self.color[2]//2), cap_rect)
        
-        bottom_rect = pygame.Rect(self.x, bottom_pipe_y,
+        bottom_rect = pygame.Rect(x, bottom_pipe_y,
                                  self.width, SCREEN_HEIGHT - bottom_pipe_y)
         pygame.draw.rect(screen, self.color, bottom_rect)
         pygame.draw.rect(screen, (self.color[0]//2, self.color[1]//2, self.color[2]//2),
                         bottom_rect, 3)
        
-        cap_rect = pygame.Rect(self.x - 5, bottom_pipe_y,
+        cap_rect = pygame.Rect(x - 5, bottom_pipe_y,
                               self.width + 10, 20)
         pygame.draw.rect(screen, (self.color[0]//2, self.color[1]//2, self.color[2]//2), cap_rect)
+
+# Screens that only change in response to input
+STATIC_SCREENS = {GameState.SETTINGS, GameState.HIGHSCORE, GameState.MODE_SELECT,
+                  GameState.BACKGROUND_THEME, GameState.TRAIL_EFFECT, GameState.SKIN_SELECTOR}
+POPUP_SCREENS = {GameState.MODE_SELECT, GameState.BACKGROUND_THEME, GameState.TRAIL_EFFECT,
+                 GameState.SKIN_SELECTOR}
+
+# The window the game is shown in. Everything is drawn to `surface`, a backbuffer at the
+# logical SCREEN_WIDTH x SCREEN_HEIGHT, so layouts stay in those pixels at any resolution.
+# present scales the backbuffer in one pass into the largest rect of the same aspect that
+# fits the window, centred between black bars. The scale writes straight into a
+# subsurface of the window, so no surface is allocated per frame; when the window is the
+# logical size (or just as big, letterboxed), the backbuffer is part of the window itself
+# and nothing is scaled at all.
+class Display:
+    FILTERS = {"nearest": pygame.transform.scale, "smooth": pygame.transform.smoothscale}
+       
+    # size None opens an 800x600 window, or uses the desktop resolution in fullscreen
+    def __init__(self, size=None, fullscreen=False, scale_filter="nearest"):
+        if size is None:
+            size = (0, 0) if fullscreen else (SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.window = pygame.display.set_mode(size, pygame.FULLSCREEN if fullscreen else 0)
+        width, height = self.window.get_size()
+        scale = min(width / SCREEN_WIDTH, height / SCREEN_HEIGHT)
+        self.viewport = pygame.Rect(0, 0, round(SCREEN_WIDTH * scale), round(SCREEN_HEIGHT * scale))
+        self.viewport.center = (width // 2, height // 2)
+        self.scaled = self.viewport.size != (SCREEN_WIDTH, SCREEN_HEIGHT)
+        # The smallest backbuffer block that scales to a whole number of window pixels
+        self.period = (SCREEN_WIDTH // math.gcd(SCREEN_WIDTH, self.viewport.width),
+                       SCREEN_HEIGHT // math.gcd(SCREEN_HEIGHT, self.viewport.height))
+        if self.scaled:
+            self.surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+            self.target = self.window.subsurface(self.viewport)
+        else:
+            self.surface = self.window.subsurface(self.viewport)
+            self.target = None
+        # smoothscale only handles 24 and 32 bit surfaces
+        if self.window.get_bitsize() < 24:
+            scale_filter = "nearest"
+        self.scale_filter = scale_filter
+        self.scale_to = self.FILTERS[scale_filter]
+        # The letterbox bars: the parts of the window left and right of, or above and
+        # below, the viewport. They are filled once and again after the window is exposed.
+        self.bars = [rect for rect in (
+            pygame.Rect(0, 0, self.viewport.left, height),
+            pygame.Rect(self.viewport.right, 0, width - self.viewport.right, height),
+            pygame.Rect(0, 0, width, self.viewport.top),
+            pygame.Rect(0, self.viewport.bottom, width, height - self.viewport.bottom),
+        ) if rect.width and rect.height]
+        self.bars_dirty = bool(self.bars)
+       
+    def invalidate(self):
+        self.bars_dirty = bool(self.bars)
+       
+    # Window pixel -> backbuffer pixel (outside 0..SCREEN_WIDTH/HEIGHT over the bars)
+    def to_logical(self, pos):
+        return (int(pos[0] - self.viewport.x) * SCREEN_WIDTH // self.viewport.width,
+                int(pos[1] - self.viewport.y) * SCREEN_HEIGHT // self.viewport.height)
+       
+    def fill_bars(self):
+        for rect in self.bars:
+            self.window.fill(BLACK, rect)
+        self.bars_dirty = False
+       
+    def flip(self):
+        if self.bars_dirty:
+            self.fill_bars()
+        if self.scaled:
+            self.scale_to(self.surface, self.viewport.size, self.target)
+        pygame.display.flip()
+       
+    # Push only these backbuffer rects. Nearest scaling maps every block of period[0] x
+    # period[1] backbuffer pixels to the same window pixels whether it is scaled alone or as
+    # part of the frame, so each rect is grown to whole blocks and scaled on its own, and
+    # matches a full frame exactly. Smooth scaling blends across block edges, so it scales
+    # the whole frame and only the pushed rects are limited.
+    def update(self, rects):
+        if self.bars_dirty:
+            self.flip()
+            return
+        if not self.scaled:
+            pygame.display.update([rect.move(self.viewport.topleft) for rect in rects])
+            return
+        if self.scale_filter != "nearest":
+            self.scale_to(self.surface, self.viewport.size, self.target)
+            pygame.display.update([self.to_window(rect) for rect in rects])
+            return
+        block_w, block_h = self.period
+        target_w, target_h = self.viewport.width // (SCREEN_WIDTH // block_w), \
+            self.viewport.height // (SCREEN_HEIGHT // block_h)
+        bounds = self.surface.get_rect()
+        window_rects = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if not rect.width or not rect.height:
+                continue
+            left, top = rect.left // block_w, rect.top // block_h
+            right, bottom = -(-rect.right // block_w), -(-rect.bottom // block_h)
+            source = pygame.Rect(left * block_w, top * block_h, (right - left) * block_w, (bottom - top) * block_h)
+            target = pygame.Rect(left * target_w, top * target_h, (right - left) * target_w, (bottom - top) * target_h)
+            self.scale_to(self.surface.subsurface(source), target.size, self.target.subsurface(target))
+            window_rects.append(target.move(self.viewport.topleft))
+        pygame.display.update(window_rects)
+       
+    # The window rect covering a backbuffer rect
+    def to_window(self, rect):
+        width, height = self.viewport.size
+        left, top = rect.left * width // SCREEN_WIDTH, rect.top * height // SCREEN_HEIGHT
+        right = -(-rect.right * width // SCREEN_WIDTH)
+        bottom = -(-rect.bottom * height // SCREEN_HEIGHT)
+        return pygame.Rect(left, top, right - left, bottom - top).move(self.viewport.topleft)
+       
+# Dirty-rectangle presentation for static screens. The first frame of a screen (or the
+# first after any input) is drawn and flipped in full. After that only regions whose
+# state changed, such as a button's hover, are redrawn under a clip rect and pushed with
+# display.update; a frame where nothing changed costs nothing.
+class DirtyRenderer:
+    def __init__(self):
+        self.screen_key = None
+        self.regions = []
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.idle_frames = 0
+       
+    def invalidate(self):
+        self.screen_key = None
+       
+    # regions is a list of (rect, state); draw() renders the whole screen
+    def present(self, display, screen_key, regions, draw):
+        if screen_key != self.screen_key or len(regions) != len(self.regions):
+            draw()
+            display.flip()
+            self.screen_key = screen_key
+            self.regions = regions
+            self.full_frames += 1
+            return
+           
+        dirty = [rect for (rect, state), (old_rect, old_state) in zip(regions, self.regions)
+                 if state != old_state or rect != old_rect]
+        self.regions = regions
+        if not dirty:
+            self.idle_frames += 1
+            return
+           
+        screen = display.surface
+        screen.set_clip(dirty[0].unionall(dirty[1:]))
+        draw()
+        screen.set_clip(None)
+        display.update(dirty)
+        self.partial_frames += 1
+       
+    def stats(self):
+        return {"full": self.full_frames, "partial": self.partial_frames, "idle": self.idle_frames}
+       
+# F3 overlay: p50/p95/p99 of every profiler scope over its rolling window, and allocations.
+# The text is re-rendered a few times a second rather than every frame.
+class ProfilerOverlay:
+    REFRESH_FRAMES = 15
+    ROW_HEIGHT = 17
+    COLUMNS = (10, 150, 200, 250)
    
-    def get_top_rect(self):
-        return pygame.Rect(self.x, 0, self.width, self.gap_y)
-   
-    def get_bottom_rect(self):
-        return pygame.Rect(self.x, self.gap_y + self.gap_height,
-                          self.width, SCREEN_HEIGHT)
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.surface = None
+        self.frames_left = 0
+       
+    def draw(self, screen):
+        self.frames_left -= 1
+        if self.surface is None or self.frames_left <= 0:
+            self.surface = self.build()
+            self.frames_left = self.REFRESH_FRAMES
+        screen.blit(self.surface, (SCREEN_WIDTH - self.surface.get_width() - 10, 10))
+       
+    def build(self):
+        font = fonts.get(18)
+        stats = self.profiler.stats()
+        allocations = self.profiler.allocation_stats()
+        rows = [(("scope ms", "p50", "p95", "p99"), YELLOW)]
+        for name, summary in stats.items():
+            color = WHITE if name == "frame" else LIGHT_GRAY
+            rows.append(((name, f"{summary['p50']:.2f}", f"{summary['p95']:.2f}", f"{summary['p99']:.2f}"), color))
+        rows.append(((f"allocs/frame {allocations['blocks_per_frame']:+.0f}",
+                      f"gc/s {allocations['gc_per_second']:.1f}"), CYAN))
+        if self.profiler.trace is not None:
+            rows.append(((f"recording trace ({len(self.profiler.trace_frames)} frames)",), RED))
+           
+        surf = pygame.Surface((310, len(rows) * self.ROW_HEIGHT + 10), pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 170))
+        for i, (cells, color) in enumerate(rows):
+            columns = self.COLUMNS if len(cells) == 4 else (10, 170)
+            for x, cell in zip(columns, cells):
+                surf.blit(font.render(cell, True, color), (x, 5 + i * self.ROW_HEIGHT))
+        return surf
 
+# A recorded best run played next to the live one. It runs its own simulation from the
+# replay's seed, so it flies through the same pipes the live bird sees, and its inputs
+# are streamed from the replay file as it goes.
+class Ghost:
+    def __init__(self, recorded, skin):
+        self.replay = recorded
+        self.sim = simulation.SkyHopperSim(**recorded.config,
+                                           bird_factory=lambda x, y, **physics: Bird(x, y, skin, **physics))
+        self.sim.reset(recorded.seed)
+        self.player = replay.Player(recorded)
+       
+    def update(self):
+        if not self.sim.done:
+            try:
+                jump = self.player.jump_at(self.sim.tick)
+            except (OSError, replay.ReplayError) as e:
+                # The file went bad mid-run; the ghost keeps flying without inputs
+                print(f"Ghost replay stopped: {e}", file=sys.stderr)
+                self.player.close()
+                jump = False
+            self.sim.step(jump)
+           
+    def draw(self, screen, alpha=1.0):
+        if not self.sim.done:
+            self.sim.bird.draw(screen, alpha, ghost=True)
+           
+    def close(self):
+        self.player.close()
+       
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    # save_dir holds the save files, replays and traces
+    # resolution is the window (or fullscreen mode) size; the game is scaled to fit it
+    def __init__(self, profile="default", dirty_rects=True, fullscreen=False, fps=FPS, headless=False,
+                 save_dir=".", resolution=None, scale_filter="nearest"):
+        init_pygame(headless)
+        self.display = Display(resolution, fullscreen, scale_filter)
+        self.screen = self.display.surface
         pygame.display.set_caption("Flippy Bird")
         self.clock = pygame.time.Clock()
        
@@ -383,84 +1376,163 @@ class Game:
        
         self.bird = None
         self.pipes = []
-        self.pipe_timer = 0
-        self.pipe_interval = 1500
+        self.pipe_interval = PIPE_INTERVAL_TICKS
+        self.sim = None
+        self.pending_jump = False
+        self.recorder = None
+        self.playback = None
+        self.ghost = None
+       
+        # Cached full-screen surfaces for the game over fade and popup backdrops
+        self.overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        self.overlay.fill(BLACK)
+        self.backdrop = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        self.backdrop_state = None
+        self.dirty_rects = dirty_rects
+        self.dirty = DirtyRenderer()
+        self.ui_version = 0
+        self.fps = fps
+        self.save_dir = save_dir
+        self.running = False
+        # Off until F3; see profiler.py
+        self.profiler = profiler.Profiler()
+        self.profiler_overlay = ProfilerOverlay(self.profiler)
        
         self.score = 0
         self.highscore = 0
         self.coins = 100
-        self.explosion_particles = []
+        self.particles = ParticleSystem()
+        self.trail = TrailRenderer(self.particles)
         self.game_over_alpha = 0
        
-        self.create_ui_elements()
-        self.load_data()
+        # Saves are written on a background thread; see storage.py
+        self.writer = storage.BackgroundWriter()
+        self.leaderboard = storage.Leaderboard(LEADERBOARD_SIZE)
+        self.leaderboard_mode = GameSpeed.NORMAL
+        self.history_pages = []
+        self.history_page = 0
+        self.history_count = 0
        
-        self.current_bird_skin = BirdSkin.RED
-        for skin in BirdSkin:
-            if skin.value["name"] == self.saved_data.get("equipped_skin", "Classic Red"):
-                self.current_bird_skin = skin
-                break
+        self.create_ui_elements()
+        self.load_data(profile)
                
         self.title_bounce = 0
         self.title_bounce_dir = 1
        
+        self.score_label = Label(fonts.get(50), WHITE)
+        self.hud_coins_label = Label(fonts.get(30), GOLD, "Coins: {}")
+        self.menu_highscore_label = Label(fonts.get(30), YELLOW, "Highscore: {}")
+       
     def create_ui_elements(self):
         button_width, button_height = 200, 50
         center_x = SCREEN_WIDTH // 2 - button_width // 2
        
-        self.play_button = Button(center_x, 200, button_width, button_height, "PLAY")
-        self.modes_button = Button(center_x, 270, button_width, button_height, "MODES")
-        self.highscore_button = Button(center_x, 340, button_width, button_height, "HIGHSCORE")
-        self.settings_button = Button(center_x, 410, button_width, button_height, "SETTINGS")
-        self.skin_button = Button(center_x, 480, button_width, button_height, "BIRD SKIN")
-       
-        self.background_button = Button(50, 500, 180, 60, "BACKGROUND")
-        self.trail_button = Button(SCREEN_WIDTH - 230, 500, 180, 60, "TRAIL")
-       
-        self.speed_button = ToggleButton(center_x, 300, 250, 50, ["SPEED: EASY", "SPEED: NORMAL", "SPEED: HARD"])
-        self.reset_score_button = Button(center_x, 380, 250, 50, "RESET HIGHSCORE", RED, (200, 50, 50))
-       
-        self.retry_button = Button(center_x, 400, button_width, button_height, "RETRY (R)", GREEN, (70, 200, 70))
-        self.menu_button = Button(center_x, 480, button_width, button_height, "MENU (ESC)", BLUE, (70, 170, 255))
-       
-        self.day_button = Button(center_x, 200, 250, 80, "Day Mode ☀️", SKY_BLUE, (100, 200, 255))
-        self.night_button = Button(center_x, 300, 250, 80, "Night Mode 🌙", NIGHT_BLUE, (50, 50, 150))
-        self.storm_button = Button(center_x, 400, 250, 80, "Storm Mode ⛈", DARK_BLUE, (100, 100, 150))
-       
-        self.sparkle_button = Button(center_x, 200, 250, 80, "Sparkle ✨", PURPLE, (180, 70, 220))
-        self.fire_button = Button(center_x, 300, 250, 80, "Fire 🔥", RED, (255, 100, 100))
-        self.rainbow_button = Button(center_x, 400, 250, 80, "Rainbow 🌈", BLUE, (150, 150, 255))
+        self.play_button = Button(center_x, 200, button_width, button_height, "PLAY", on_click=self.start_game)
+        self.modes_button = Button(center_x, 270, button_width, button_height, "MODES",
+                                   on_click=lambda: self.show(GameState.MODE_SELECT))
+        self.highscore_button = Button(center_x, 340, button_width, button_height, "HIGHSCORE",
+                                       on_click=self.open_highscore)
+        self.settings_button = Button(center_x, 410, button_width, button_height, "SETTINGS",
+                                      on_click=lambda: self.show(GameState.SETTINGS))
+        self.skin_button = Button(center_x, 480, button_width, button_height, "BIRD SKIN",
+                                  on_click=lambda: self.show(GameState.SKIN_SELECTOR))
+       
+        self.background_button = Button(50, 500, 180, 60, "BACKGROUND", on_click=lambda: self.show(GameState.BACKGROUND_THEME))
+        self.trail_button = Button(SCREEN_WIDTH - 230, 500, 180, 60, "TRAIL", on_click=lambda: self.show(GameState.TRAIL_EFFECT))
+       
+        self.speed_button = ToggleButton(center_x, 300, 250, 50, ["SPEED: EASY", "SPEED: NORMAL", "SPEED: HARD"],
+                                         on_click=self.cycle_speed)
+        self.reset_score_button = Button(center_x, 380, 250, 50, "RESET HIGHSCORE", RED, (200, 50, 50),
+                                         on_click=self.reset_highscore)
+        self.ghost_button = ToggleButton(center_x, 440, 250, 45, ["GHOST: OFF", "GHOST: ON"], on_click=self.toggle_ghost)
+       
+        self.retry_button = Button(center_x, 400, button_width, button_height, "RETRY (R)", GREEN, (70, 200, 70),
+                                   on_click=self.start_game)
+        self.menu_button = Button(center_x, 480, button_width, button_height, "MENU (ESC)", BLUE, (70, 170, 255),
+                                  on_click=self.back_to_menu)
+       
+        # Choice groups: (value, button, outline color when it is the current choice)
+        self.theme_choices = self.catalog_choices(content.themes, BackgroundTheme, self.choose_theme)
+        self.trail_choices = self.catalog_choices(content.trails, TrailEffect, self.choose_trail)
        
         # MODE_SELECT ekranı için butonlar
-        self.easy_mode_button = Button(center_x, 200, 250, 80, "EASY MODE", GREEN, (70, 200, 70))
-        self.normal_mode_button = Button(center_x, 300, 250, 80, "NORMAL MODE", BLUE, (70, 170, 255))
-        self.hard_mode_button = Button(center_x, 400, 250, 80, "HARD MODE", RED, (200, 50, 50))
-       
-    def load_data(self):
-        self.saved_data = {
-            "highscore": 0,
-            "coins": 100,
-            "unlocked_skins": ["Classic Red"],
-            "equipped_skin": "Classic Red",
-            "background_theme": "DAY",
-            "trail_effect": "SPARKLE",
-            "game_speed": "NORMAL"
+        self.easy_mode_button = Button(center_x, 200, 250, 80, "EASY MODE", GREEN, (70, 200, 70),
+                                       on_click=lambda: self.choose_mode(GameSpeed.EASY))
+        self.normal_mode_button = Button(center_x, 300, 250, 80, "NORMAL MODE", BLUE, (70, 170, 255),
+                                         on_click=lambda: self.choose_mode(GameSpeed.NORMAL))
+        self.hard_mode_button = Button(center_x, 400, 250, 80, "HARD MODE", RED, (200, 50, 50),
+                                       on_click=lambda: self.choose_mode(GameSpeed.HARD))
+       
+        # HIGHSCORE screen: one tab per mode and paging for the run history
+        self.leaderboard_tabs = [
+            (GameSpeed.EASY, Button(165, 95, 140, 40, "EASY", GREEN, (70, 200, 70),
+                                    on_click=lambda: self.set_leaderboard_mode(GameSpeed.EASY))),
+            (GameSpeed.NORMAL, Button(330, 95, 140, 40, "NORMAL", BLUE, (70, 170, 255),
+                                      on_click=lambda: self.set_leaderboard_mode(GameSpeed.NORMAL))),
+            (GameSpeed.HARD, Button(495, 95, 140, 40, "HARD", RED, (200, 50, 50),
+                                    on_click=lambda: self.set_leaderboard_mode(GameSpeed.HARD)))]
+        self.history_newer_button = Button(435, 432, 60, 36, "<", DARK_BLUE, (70, 70, 160),
+                                           on_click=lambda: self.change_history_page(-1))
+        self.history_older_button = Button(685, 432, 60, 36, ">", DARK_BLUE, (70, 70, 160),
+                                           on_click=lambda: self.change_history_page(1))
+       
+        self.mode_choices = [(GameSpeed.EASY, self.easy_mode_button, YELLOW),
+                             (GameSpeed.NORMAL, self.normal_mode_button, YELLOW),
+                             (GameSpeed.HARD, self.hard_mode_button, YELLOW)]
+        self.tab_choices = [(speed, tab, GOLD) for speed, tab in self.leaderboard_tabs]
+       
+        self.screens = {
+            GameState.MAIN_MENU: WidgetScreen([self.play_button, self.modes_button, self.highscore_button,
+                                               self.settings_button, self.skin_button,
+                                               self.background_button, self.trail_button]),
+            GameState.BACKGROUND_THEME: WidgetScreen(button for _, button, _ in self.theme_choices),
+            GameState.TRAIL_EFFECT: WidgetScreen(button for _, button, _ in self.trail_choices),
+            GameState.MODE_SELECT: WidgetScreen(button for _, button, _ in self.mode_choices),
+            GameState.SETTINGS: WidgetScreen([self.speed_button, self.reset_score_button, self.ghost_button]),
+            GameState.HIGHSCORE: WidgetScreen([tab for _, tab in self.leaderboard_tabs] +
+                                              [self.history_newer_button, self.history_older_button]),
+            GameState.GAME_OVER: WidgetScreen([self.retry_button, self.menu_button]),
         }
-       
-        try:
-            if os.path.exists("flappy_bird_save.json"):
-                with open("flappy_bird_save.json", "r") as f:
-                    loaded_data = json.load(f)
-                    self.saved_data.update(loaded_data)
-        except:
-            pass
-           
+        self.active_screen = None
+       
+        # Below the title and above the ESC hint of the 700x550 skin popup
+        self.skin_grid = SkinGrid((SCREEN_WIDTH // 2 - 320, SCREEN_HEIGHT // 2 - 185, 640, 420), content.skins)
+       
+    # One popup button per catalog entry whose key names a built-in style, stacked
+    # down the popup in manifest order
+    def catalog_choices(self, entries, styles, choose):
+        choices = []
+        x = SCREEN_WIDTH // 2 - 100
+        for entry in entries:
+            if entry.key not in styles.__members__:
+                print(f"Skipping catalog entry {entry.key!r}: no such style", file=sys.stderr)
+                continue
+            style = styles[entry.key]
+            button = Button(x, 200 + len(choices) * 100, 250, 80, entry.name, entry.color, entry.hover_color,
+                            on_click=lambda style=style: choose(style))
+            choices.append((style, button, entry.outline))
+        return choices
+       
+    def load_data(self, profile="default"):
+        os.makedirs(self.save_dir, exist_ok=True)
+        self.store = storage.open_store(os.path.join(self.save_dir, SAVE_DB_PATH),
+                                        os.path.join(self.save_dir, SAVE_PATH), SAVE_DEFAULTS, self.writer, profile)
+        self.saved_data = self.store.load()
+        self.apply_saved_data()
+       
+    # Make another profile current (created on first use)
+    def switch_profile(self, name):
+        self.saved_data = self.store.switch_profile(name)
+        self.apply_saved_data()
+       
+    def apply_saved_data(self):
         self.highscore = self.saved_data["highscore"]
         self.coins = self.saved_data["coins"]
        
-        for skin in BirdSkin:
-            if skin.value["name"] in self.saved_data["unlocked_skins"]:
-                skin.value["unlocked"] = True
+        # Skins are saved by name; names no longer in the catalog are kept but not shown
+        self.owned_skins = {content.starter.name, *self.saved_data["unlocked_skins"]}
+        self.skin_grid.owned = self.owned_skins
+        self.current_bird_skin = content.by_name.get(self.saved_data.get("equipped_skin"), content.starter)
                
         theme_str = self.saved_data.get("background_theme", "DAY")
         if theme_str == "DAY":
@@ -490,268 +1562,285 @@ class Game:
             self.game_speed = GameSpeed.HARD
             self.speed_button.current_index = 2
            
+        self.ghost_enabled = bool(self.saved_data.get("ghost", False))
+        self.ghost_button.current_index = 1 if self.ghost_enabled else 0
+       
+        self.leaderboard.load(self.store, [speed.name for speed in GameSpeed])
+           
+    # Changes are journaled as they happen (see storage.JournalStore); this only
+    # records whichever of these values differ from what is already stored.
     def save_data(self):
-        self.saved_data["highscore"] = self.highscore
-        self.saved_data["coins"] = self.coins
-        self.saved_data["equipped_skin"] = self.current_bird_skin.value["name"]
+        self.store.set("highscore", self.highscore)
+        self.store.set("coins", self.coins)
+        self.store.set("equipped_skin", self.current_bird_skin.name)
+        self.store.set("background_theme", self.current_theme.name)
+        self.store.set("trail_effect", self.trail_effect.name)
+        self.store.set("game_speed", self.game_speed.name)
+           
+    def show(self, state):
+        self.state = state
        
-        unlocked_skins = []
-        for skin in BirdSkin:
-            if skin.value["unlocked"]:
-                unlocked_skins.append(skin.value["name"])
-        self.saved_data["unlocked_skins"] = unlocked_skins
+    def start_game(self):
+        self.state = GameState.PLAYING
+        self.reset_game()
        
-        self.saved_data["background_theme"] = self.current_theme.name
-        self.saved_data["trail_effect"] = self.trail_effect.name
-        self.saved_data["game_speed"] = ["EASY", "NORMAL", "HARD"][self.speed_button.current_index]
+    def back_to_menu(self):
+        self.state = GameState.MAIN_MENU
+        self.save_data()
        
-        try:
-            with open("flappy_bird_save.json", "w") as f:
-                json.dump(self.saved_data, f)
-        except:
-            pass
-           
-    def reset_game(self):
-        self.bird = Bird(SCREEN_WIDTH // 3, SCREEN_HEIGHT // 2, self.current_bird_skin)
-        self.pipes = []
-        self.pipe_timer = 0
-        self.score = 0
-        self.explosion_particles = []
-        self.game_over_alpha = 0
+    def choose_theme(self, theme):
+        self.current_theme = theme
+        self.background.set_theme(theme)
+        self.store.set("background_theme", theme.name)
        
-    def create_explosion(self, x, y):
-        for _ in range(30):
-            self.explosion_particles.append(ExplosionParticle(x, y))
+    def choose_trail(self, effect):
+        self.trail_effect = effect
+        self.store.set("trail_effect", effect.name)
        
-    def draw_background_theme_popup(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-       
-        popup_width, popup_height = 600, 500
-        popup_x, popup_y = SCREEN_WIDTH // 2 - popup_width // 2, SCREEN_HEIGHT // 2 - popup_height // 2
-        popup_rect = pygame.Rect(popup_x, popup_y, popup_width, popup_height)
-        pygame.draw.rect(self.screen, DARK_BLUE, popup_rect, border_radius=20)
-        pygame.draw.rect(self.screen, WHITE, popup_rect, 3, border_radius=20)
+    def choose_mode(self, speed):
+        self.game_speed = speed
+        self.speed_button.current_index = list(GameSpeed).index(speed)
+        self.back_to_menu()
        
-        title_font = pygame.font.SysFont(None, 50)
-        title_text = title_font.render("Background Theme", True, WHITE)
-        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, popup_y + 30))
+    # The SETTINGS speed toggle has already moved to its next option
+    def cycle_speed(self):
+        self.game_speed = list(GameSpeed)[self.speed_button.current_index]
+        self.store.set("game_speed", self.game_speed.name)
        
-        self.day_button.draw(self.screen)
-        self.night_button.draw(self.screen)
-        self.storm_button.draw(self.screen)
+    def toggle_ghost(self):
+        self.ghost_enabled = self.ghost_button.current_index == 1
+        self.store.set("ghost", self.ghost_enabled)
        
-        if self.current_theme == BackgroundTheme.DAY:
-            pygame.draw.rect(self.screen, YELLOW, self.day_button.rect, 4, border_radius=15)
-        elif self.current_theme == BackgroundTheme.NIGHT:
-            pygame.draw.rect(self.screen, CYAN, self.night_button.rect, 4, border_radius=15)
-        elif self.current_theme == BackgroundTheme.STORM:
-            pygame.draw.rect(self.screen, YELLOW, self.storm_button.rect, 4, border_radius=15)
+    # Clears the run history and the best replays with it, so no ghost races an erased run
+    def reset_highscore(self):
+        self.highscore = 0
+        self.store.set("highscore", 0)
+        self.store.clear_runs()
+        self.leaderboard.clear()
+        for speed in GameSpeed:
+            path = self.replay_path(f"best-{speed.name}")
+            # Same key as save_replay, so a best still waiting to be written is dropped too
+            self.writer.submit(lambda path=path: self.delete_replay(path), key=path)
+       
+    def set_leaderboard_mode(self, speed):
+        self.leaderboard_mode = speed
+       
+    # Outline the button of the current choice in a group
+    def mark_choice(self, choices, current):
+        for value, button, color in choices:
+            button.selected = color if value == current else None
+           
+    def record_run(self):
+        self.save_replay(self.score > self.leaderboard.best(self.game_speed.name))
+        run = {
+            "mode": self.game_speed.name,
+            "score": self.score,
+            "skin": self.current_bird_skin.name,
+            "theme": self.current_theme.name,
+            "duration_ticks": self.sim.tick,
+            "ts": time.time(),
+        }
+        self.store.record_run(run)
+        self.leaderboard.add(run)
+       
+    def open_highscore(self):
+        self.state = GameState.HIGHSCORE
+        self.leaderboard_mode = self.game_speed
+        self.history_pages = []
+        self.history_page = 0
+        self.history_count = self.store.run_count()
+        self.load_history_page()
+       
+    # History pages are fetched from the store only when first shown, then kept for the visit
+    def load_history_page(self):
+        if self.history_page < len(self.history_pages):
+            return True
+        if self.history_pages and len(self.history_pages[-1]) < HISTORY_PAGE_SIZE:
+            return False
+        before = self.history_pages[-1][-1][0] if self.history_pages else None
+        runs = self.store.runs_page(before, HISTORY_PAGE_SIZE)
+        if not runs and self.history_pages:
+            return False
+        rows = []
+        for run in runs:
+            when = datetime.datetime.fromtimestamp(run["ts"]).strftime("%m-%d %H:%M")
+            seconds = run["duration_ticks"] / SIM_RATE
+            rows.append((run["id"], f"{run['score']:>4}  {run['mode']:<6}", f"{seconds:5.1f}s  {when}"))
+        self.history_pages.append(rows)
+        return True
+       
+    def change_history_page(self, step):
+        page = self.history_page + step
+        if page < 0:
+            return
+        previous = self.history_page
+        self.history_page = page
+        if not self.load_history_page():
+            self.history_page = previous
+           
+    def change_leaderboard_mode(self, step):
+        speeds = list(GameSpeed)
+        self.leaderboard_mode = speeds[(speeds.index(self.leaderboard_mode) + step) % len(speeds)]
+           
+    def make_bird(self, x, y, **physics):
+        return Bird(x, y, self.current_bird_skin, **physics)
+
+    # config overrides the simulation settings, which is how a replay gets its recorded ones
+    def reset_game(self, seed=None, config=None):
+        config = config or dict(pipe_speed=PIPE_SPEEDS[self.game_speed], pipe_interval=self.pipe_interval,
+                                width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
+        self.sim = simulation.SkyHopperSim(**config, bird_factory=self.make_bird, pipe_factory=Pipe)
+        self.close_ghost()
+        if self.ghost_enabled and seed is None:
+            self.ghost = self.load_ghost()
+            if self.ghost:
+                seed = self.ghost.replay.seed
+        self.sim.reset(seed)
+        self.recorder = replay.Recorder()
+        self.playback = None
+        self.bird = self.sim.bird
+        self.pipes = self.sim.pipes
+        self.pending_jump = False
+        self.score = 0
+        self.particles.clear()
+        self.trail.reset()
+        self.game_over_alpha = 0
        
-        esc_font = pygame.font.SysFont(None, 30)
-        esc_text = esc_font.render("Press ESC to go back", True, LIGHT_GRAY)
-        self.screen.blit(esc_text, (SCREEN_WIDTH // 2 - esc_text.get_width() // 2, popup_y + 450))
+    # Play a recorded run in place of live input; it ends on the usual game over screen
+    def start_replay(self, recorded):
+        self.state = GameState.PLAYING
+        self.reset_game(recorded.seed, recorded.config)
+        self.recorder = None
+        self.playback = replay.Player(recorded)
+       
+    # The best run for the current mode, if there is one recorded with the current settings
+    def load_ghost(self):
+        path = self.replay_path(f"best-{self.game_speed.name}")
+        # A best run from the last game may still be waiting on the writer
+        self.writer.flush()
+        if not os.path.exists(path):
+            return None
+        try:
+            recorded = replay.StreamedReplay(path)
+            if any(float(value) != float(getattr(self.sim, key)) for key, value in recorded.config.items()):
+                return None
+            # Drawn in the live bird's skin so it reuses that atlas sheet rather than baking another
+            return Ghost(recorded, self.current_bird_skin)
+        except (OSError, replay.ReplayError) as e:
+            print(f"Could not load ghost {path}: {e}", file=sys.stderr)
+            return None
+       
+    def close_ghost(self):
+        if self.ghost:
+            self.ghost.close()
+            self.ghost = None
+       
+    def replay_path(self, name):
+        profile = "".join(c for c in str(self.store.profile) if c.isalnum() or c in "-_") or "default"
+        return os.path.join(self.save_dir, REPLAY_DIR, f"{profile}-{name}.shrp")
+       
+    # Every run is kept as <profile>-last.shrp, and a new per-mode best also as <profile>-best-<MODE>.shrp
+    def save_replay(self, is_best):
+        meta = {"mode": self.game_speed.name, "skin": self.current_bird_skin.name,
+                "theme": self.current_theme.name, "ts": time.time()}
+        data = self.recorder.finish(self.sim, meta).to_bytes()
+        paths = [self.replay_path("last")]
+        if is_best:
+            paths.append(self.replay_path(f"best-{self.game_speed.name}"))
+        for path in paths:
+            self.writer.submit(lambda path=path: self.write_replay(path, data), key=path)
+           
+    # Runs on the writer thread
+    def write_replay(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        storage.atomic_write(path, data)
        
-    def draw_trail_effect_popup(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-       
-        popup_width, popup_height = 600, 500
-        popup_x, popup_y = SCREEN_WIDTH // 2 - popup_width // 2, SCREEN_HEIGHT // 2 - popup_height // 2
-        popup_rect = pygame.Rect(popup_x, popup_y, popup_width, popup_height)
+    # Runs on the writer thread
+    def delete_replay(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+       
+    def create_explosion(self, x, y):
+        self.particles.emit(x, y, 30)
+       
+    # Popups sit on a dimmed copy of whatever was on screen when they opened; the copy
+    # is taken once, so drawing a popup never stacks another overlay on the last frame
+    def draw_popup_backdrop(self):
+        if self.backdrop_state != self.state:
+            self.backdrop.blit(self.screen, (0, 0))
+            self.overlay.set_alpha(200)
+            self.backdrop.blit(self.overlay, (0, 0))
+            self.backdrop_state = self.state
+        self.screen.blit(self.backdrop, (0, 0))
+       
+    # Backdrop, panel and title shared by every popup; returns the panel rect
+    def draw_popup_frame(self, title, width=600, height=500):
+        self.draw_popup_backdrop()
+       
+        popup_rect = pygame.Rect(SCREEN_WIDTH // 2 - width // 2, SCREEN_HEIGHT // 2 - height // 2, width, height)
         pygame.draw.rect(self.screen, DARK_BLUE, popup_rect, border_radius=20)
         pygame.draw.rect(self.screen, WHITE, popup_rect, 3, border_radius=20)
        
-        title_font = pygame.font.SysFont(None, 50)
-        title_text = title_font.render("Trail Effect", True, WHITE)
-        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, popup_y + 30))
-       
-        self.sparkle_button.draw(self.screen)
-        self.fire_button.draw(self.screen)
-        self.rainbow_button.draw(self.screen)
+        title_font = fonts.get(50)
+        title_text = text_cache.render(title_font, title, WHITE)
+        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, popup_rect.y + 30))
+        return popup_rect
+   
+    def draw_esc_hint(self, y):
+        esc_font = fonts.get(30)
+        esc_text = text_cache.render(esc_font, "Press ESC to go back", LIGHT_GRAY)
+        self.screen.blit(esc_text, (SCREEN_WIDTH // 2 - esc_text.get_width() // 2, y))
+       
+    # A popup whose body is a group of choice buttons
+    def draw_choice_popup(self, title, choices, current):
+        popup_rect = self.draw_popup_frame(title)
+        self.mark_choice(choices, current)
+        self.screens[self.state].draw(self.screen)
+        self.draw_esc_hint(popup_rect.y + 450)
+        return popup_rect
        
-        if self.trail_effect == TrailEffect.SPARKLE:
-            pygame.draw.rect(self.screen, PURPLE, self.sparkle_button.rect, 4, border_radius=15)
-        elif self.trail_effect == TrailEffect.FIRE:
-            pygame.draw.rect(self.screen, RED, self.fire_button.rect, 4, border_radius=15)
-        elif self.trail_effect == TrailEffect.RAINBOW:
-            pygame.draw.rect(self.screen, CYAN, self.rainbow_button.rect, 4, border_radius=15)
+    def draw_background_theme_popup(self):
+        self.draw_choice_popup("Background Theme", self.theme_choices, self.current_theme)
        
-        esc_font = pygame.font.SysFont(None, 30)
-        esc_text = esc_font.render("Press ESC to go back", True, LIGHT_GRAY)
-        self.screen.blit(esc_text, (SCREEN_WIDTH // 2 - esc_text.get_width() // 2, popup_y + 450))
+    def draw_trail_effect_popup(self):
+        self.draw_choice_popup("Trail Effect", self.trail_choices, self.trail_effect)
 
     def draw_mode_select_popup(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-       
-        popup_width, popup_height = 600, 500
-        popup_x, popup_y = SCREEN_WIDTH // 2 - popup_width // 2, SCREEN_HEIGHT // 2 - popup_height // 2
-        popup_rect = pygame.Rect(popup_x, popup_y, popup_width, popup_height)
-        pygame.draw.rect(self.screen, DARK_BLUE, popup_rect, border_radius=20)
-        pygame.draw.rect(self.screen, WHITE, popup_rect, 3, border_radius=20)
+        self.draw_choice_popup("Select Game Mode", self.mode_choices, self.game_speed)
        
-        title_font = pygame.font.SysFont(None, 50)
-        title_text = title_font.render("Select Game Mode", True, WHITE)
-        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, popup_y + 30))
-       
-        self.easy_mode_button.draw(self.screen)
-        self.normal_mode_button.draw(self.screen)
-        self.hard_mode_button.draw(self.screen)
-       
-        current_mode_color = YELLOW
-        if self.game_speed == GameSpeed.EASY:
-            pygame.draw.rect(self.screen, current_mode_color, self.easy_mode_button.rect, 4, border_radius=15)
-        elif self.game_speed == GameSpeed.NORMAL:
-            pygame.draw.rect(self.screen, current_mode_color, self.normal_mode_button.rect, 4, border_radius=15)
-        elif self.game_speed == GameSpeed.HARD:
-            pygame.draw.rect(self.screen, current_mode_color, self.hard_mode_button.rect, 4, border_radius=15)
-       
-        desc_font = pygame.font.SysFont(None, 24)
-        easy_desc = desc_font.render("Pipe Speed: Slow, Gravity: Low", True, GREEN)
-        normal_desc = desc_font.render("Pipe Speed: Normal, Gravity: Normal", True, BLUE)
-        hard_desc = desc_font.render("Pipe Speed: Fast, Gravity: High", True, RED)
+        desc_font = fonts.get(24)
+        easy_desc = text_cache.render(desc_font, "Pipe Speed: Slow, Gravity: Low", GREEN)
+        normal_desc = text_cache.render(desc_font, "Pipe Speed: Normal, Gravity: Normal", BLUE)
+        hard_desc = text_cache.render(desc_font, "Pipe Speed: Fast, Gravity: High", RED)
         
         self.screen.blit(easy_desc, (SCREEN_WIDTH // 2 - easy_desc.get_width() // 2, 320))
         self.screen.blit(normal_desc, (SCREEN_WIDTH // 2 - normal_desc.get_width() // 2, 380))
         self.screen.blit(hard_desc, (SCREEN_WIDTH // 2 - hard_desc.get_width() // 2, 440))
        
-        esc_font = pygame.font.SysFont(None, 30)
-        esc_text = esc_font.render("Press ESC to go back", True, LIGHT_GRAY)
-        self.screen.blit(esc_text, (SCREEN_WIDTH // 2 - esc_text.get_width() // 2, popup_y + 450))
-       
     def draw_skin_selector_popup(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
-       
-        popup_width, popup_height = 700, 550
-        popup_x, popup_y = SCREEN_WIDTH // 2 - popup_width // 2, SCREEN_HEIGHT // 2 - popup_height // 2
-        popup_rect = pygame.Rect(popup_x, popup_y, popup_width, popup_height)
-        pygame.draw.rect(self.screen, DARK_BLUE, popup_rect, border_radius=20)
-        pygame.draw.rect(self.screen, WHITE, popup_rect, 3, border_radius=20)
-       
-        title_font = pygame.font.SysFont(None, 50)
-        title_text = title_font.render("Select Bird Skin", True, WHITE)
-        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, popup_y + 30))
-       
-        coin_font = pygame.font.SysFont(None, 35)
-        coin_text = coin_font.render(f"Coins: {self.coins}", True, GOLD)
-        self.screen.blit(coin_text, (popup_x + popup_width - coin_text.get_width() - 30, popup_y + 30))
-       
-        skin_list = list(BirdSkin)
-        categories = {}
-        for skin in skin_list:
-            category = skin.value["category"]
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(skin)
-       
-        y_offset = popup_y + 90
-        for category, skins in categories.items():
-            cat_font = pygame.font.SysFont(None, 28)
-            cat_color = CYAN if category == "Special" else GOLD if category == "Premium" else GREEN
-            cat_text = cat_font.render(f"{category} Skins", True, cat_color)
-            self.screen.blit(cat_text, (popup_x + 30, y_offset))
-            y_offset += 35
-           
-            for i, skin in enumerate(skins):
-                row = i // 3
-                col = i % 3
-               
-                card_x = popup_x + 30 + col * 200
-                card_y = y_offset + row * 140
-               
-                card_radius = 50
-                card_center = (card_x + 70, card_y + 70)
-               
-                if skin == self.current_bird_skin:
-                    for r in range(card_radius, card_radius + 8):
-                        pygame.draw.circle(self.screen, GOLD, card_center, r, 2)
-                    pygame.draw.circle(self.screen, DARK_GRAY, card_center, card_radius)
-                elif skin.value["unlocked"]:
-                    pygame.draw.circle(self.screen, GREEN, card_center, card_radius + 4, 3)
-                    pygame.draw.circle(self.screen, DARK_GRAY, card_center, card_radius)
-                else:
-                    pygame.draw.circle(self.screen, GRAY, card_center, card_radius + 4, 3)
-                    pygame.draw.circle(self.screen, DARK_GRAY, card_center, card_radius)
-                   
-                    lock_surf = pygame.Surface((card_radius * 2, card_radius * 2), pygame.SRCALPHA)
-                    pygame.draw.circle(lock_surf, (0, 0, 0, 150), (card_radius, card_radius), card_radius)
-                    self.screen.blit(lock_surf, (card_x + 20, card_y + 20))
-                   
-                    lock_font = pygame.font.SysFont(None, 40)
-                    lock_text = lock_font.render("🔒", True, WHITE)
-                    self.screen.blit(lock_text, (card_x + 55, card_y + 55))
-               
-                self.draw_bird_preview(skin, card_center[0], card_center[1], 30)
-               
-                name_font = pygame.font.SysFont(None, 18)
-                name_text = name_font.render(skin.value["name"], True, WHITE)
-                self.screen.blit(name_text, (card_x + 70 - name_text.get_width() // 2, card_y + 110))
-               
-                status_font = pygame.font.SysFont(None, 16)
-                if skin.value["unlocked"]:
-                    if skin == self.current_bird_skin:
-                        status_text = status_font.render("EQUIPPED", True, GREEN)
-                    else:
-                        status_text = status_font.render("OWNED", True, CYAN)
-                else:
-                    status_text = status_font.render(f"{skin.value['price']} coins", True, YELLOW)
-                self.screen.blit(status_text, (card_x + 70 - status_text.get_width() // 2, card_y + 125))
-           
-            y_offset += (len(skins) // 3 + 1) * 140
-           
-            if list(categories.keys()).index(category) < len(categories) - 1:
-                pygame.draw.line(self.screen, GRAY,
-                               (popup_x + 30, y_offset - 20),
-                               (popup_x + popup_width - 30, y_offset - 20), 2)
+        popup_rect = self.draw_popup_frame("Select Bird Skin", 700, 550)
        
-        esc_font = pygame.font.SysFont(None, 30)
-        esc_text = esc_font.render("Press ESC to go back", True, LIGHT_GRAY)
-        self.screen.blit(esc_text, (SCREEN_WIDTH // 2 - esc_text.get_width() // 2, popup_y + 520))
+        coin_font = fonts.get(35)
+        coin_text = text_cache.render(coin_font, f"Coins: {self.coins}", GOLD)
+        self.screen.blit(coin_text, (popup_rect.right - coin_text.get_width() - 30, popup_rect.y + 30))
        
-    def draw_bird_preview(self, skin, x, y, size):
-        flap_offset = math.sin(pygame.time.get_ticks() * 0.005) * 3
-        color = skin.value["color"]
+        self.skin_grid.equipped = self.current_bird_skin
+        self.skin_grid.draw(self.screen, self.preview_flap_index())
        
-        pygame.draw.circle(self.screen, color, (int(x), int(y)), size)
-        pygame.draw.circle(self.screen, WHITE, (int(x + size * 0.4), int(y - size * 0.3)), int(size * 0.3))
-        pygame.draw.circle(self.screen, BLACK, (int(x + size * 0.4), int(y - size * 0.3)), int(size * 0.15))
+        self.draw_esc_hint(popup_rect.y + 520)
        
-        wing_points = [
-            (x - size * 0.5, y),
-            (x - size * 0.7, y + size * 0.5 + flap_offset),
-            (x, y + size * 0.3)
-        ]
-        wing_color = (color[0]//2, color[1]//2, color[2]//2)
-        pygame.draw.polygon(self.screen, wing_color, wing_points)
-       
-        beak_points = [
-            (x + size * 0.8, y),
-            (x + size * 1.2, y),
-            (x + size * 0.8, y + size * 0.4)
-        ]
-        pygame.draw.polygon(self.screen, ORANGE, beak_points)
+    def preview_flap_index(self):
+        phase = (pygame.time.get_ticks() * 0.005) % (2 * math.pi)
+        return int(phase / (2 * math.pi) * BirdAtlas.FLAP_FRAMES)
        
     def draw_main_menu(self):
         self.background.draw(self.screen)
-        self.background.update()
        
-        self.title_bounce += 0.1 * self.title_bounce_dir
-        if self.title_bounce > 5 or self.title_bounce < -5:
-            self.title_bounce_dir *= -1
-           
-        title_font = pygame.font.SysFont(None, 80)
-        title_text = title_font.render("FLIPPY BIRD", True, WHITE)
-        title_shadow = title_font.render("FLIPPY BIRD", True, (50, 50, 50, 150))
+        title_font = fonts.get(80)
+        title_text = text_cache.render(title_font, "FLIPPY BIRD", WHITE)
+        title_shadow = text_cache.render(title_font, "FLIPPY BIRD", (50, 50, 50, 150))
        
         title_x = SCREEN_WIDTH // 2
         title_y = 100 + self.title_bounce
@@ -761,382 +1850,458 @@ class Game:
         self.screen.blit(title_text, (title_x - title_text.get_width()//2,
                                      title_y - title_text.get_height()//2))
        
-        self.play_button.draw(self.screen)
-        self.modes_button.draw(self.screen)
-        self.highscore_button.draw(self.screen)
-        self.settings_button.draw(self.screen)
-        self.skin_button.draw(self.screen)
+        self.screens[GameState.MAIN_MENU].draw(self.screen)
        
-        self.background_button.draw(self.screen)
-        self.trail_button.draw(self.screen)
-       
-        version_font = pygame.font.SysFont(None, 24)
-        version_text = version_font.render("v1.0", True, WHITE)
+        version_font = fonts.get(24)
+        version_text = text_cache.render(version_font, "v1.0", WHITE)
         self.screen.blit(version_text, (10, SCREEN_HEIGHT - 30))
        
-        highscore_font = pygame.font.SysFont(None, 30)
-        highscore_text = highscore_font.render(f"Highscore: {self.highscore}", True, YELLOW)
-        self.screen.blit(highscore_text, (SCREEN_WIDTH - highscore_text.get_width() - 10, 10))
-       
-        coins_font = pygame.font.SysFont(None, 30)
-        coins_text = coins_font.render(f"Coins: {self.coins}", True, GOLD)
-        self.screen.blit(coins_text, (10, 10))
+        self.menu_highscore_label.draw(self.screen, self.highscore, topright=(SCREEN_WIDTH - 10, 10))
+        self.hud_coins_label.draw(self.screen, self.coins, topleft=(10, 10))
        
-    def draw_game(self):
-        self.background.draw(self.screen)
-        self.background.update()
-       
-        for particle in self.explosion_particles[:]:
-            particle.update()
-            particle.draw(self.screen)
-            if not particle.is_alive():
-                self.explosion_particles.remove(particle)
+    def draw_game(self, alpha=1.0):
+        scope = self.profiler.scope
+        with scope("background.draw"):
+            self.background.draw(self.screen)
            
-        for pipe in self.pipes:
-            pipe.draw(self.screen)
+        with scope("particles.draw"):
+            self.particles.draw(self.screen)
            
+        with scope("pipes.draw"):
+            for pipe in self.pipes:
+                pipe.draw(self.screen, alpha)
+               
+        if self.ghost:
+            with scope("ghost.draw"):
+                self.ghost.draw(self.screen, alpha)
+               
         if self.bird:
-            self.bird.draw(self.screen)
-           
-        score_font = pygame.font.SysFont(None, 50)
-        score_text = score_font.render(f"{self.score}", True, WHITE)
-        self.screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, 30))
-       
-        coin_font = pygame.font.SysFont(None, 30)
-        coin_text = coin_font.render(f"Coins: {self.coins}", True, GOLD)
-        self.screen.blit(coin_text, (10, 70))
+            with scope("bird.draw"):
+                if self.bird.alive:
+                    self.trail.draw(self.screen, self.trail_effect, self.bird, self.sim.pipe_speed)
+                self.bird.draw(self.screen, alpha)
+               
+        with scope("hud.draw"):
+            self.score_label.draw(self.screen, self.score, midtop=(SCREEN_WIDTH // 2, 30))
+            self.hud_coins_label.draw(self.screen, self.coins, topleft=(10, 70))
        
+    # The simulation has stopped, so the scene is drawn where it ended rather than blended
+    # with the step before; a blend that follows the frame clock would make it shake
     def draw_game_over(self):
-        self.draw_game()
-       
-        if self.game_over_alpha < 180:
-            self.game_over_alpha += 5
+        self.draw_game(1.0)
        
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(self.game_over_alpha)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        self.overlay.set_alpha(self.game_over_alpha)
+        self.screen.blit(self.overlay, (0, 0))
        
-        title_font = pygame.font.SysFont(None, 80)
-        title_text = title_font.render("GAME OVER", True, RED)
+        title_font = fonts.get(80)
+        title_text = text_cache.render(title_font, "GAME OVER", RED)
         self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 150))
        
-        score_font = pygame.font.SysFont(None, 50)
-        score_text = score_font.render(f"Score: {self.score}", True, WHITE)
+        score_font = fonts.get(50)
+        score_text = text_cache.render(score_font, f"Score: {self.score}", WHITE)
         self.screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, 250))
        
-        highscore_text = score_font.render(f"Highscore: {self.highscore}", True, YELLOW)
+        highscore_text = text_cache.render(score_font, f"Highscore: {self.highscore}", YELLOW)
         self.screen.blit(highscore_text, (SCREEN_WIDTH // 2 - highscore_text.get_width() // 2, 320))
        
         if self.score > self.highscore:
-            new_record_font = pygame.font.SysFont(None, 40)
-            new_record_text = new_record_font.render("NEW RECORD!", True, GOLD)
+            new_record_font = fonts.get(40)
+            new_record_text = text_cache.render(new_record_font, "NEW RECORD!", GOLD)
             self.screen.blit(new_record_text, (SCREEN_WIDTH // 2 - new_record_text.get_width() // 2, 380))
        
-        self.retry_button.draw(self.screen)
-        self.menu_button.draw(self.screen)
+        self.screens[GameState.GAME_OVER].draw(self.screen)
        
-        controls_font = pygame.font.SysFont(None, 25)
-        controls_text = controls_font.render("Press R to retry or ESC for menu", True, LIGHT_GRAY)
+        controls_font = fonts.get(25)
+        controls_text = text_cache.render(controls_font, "Press R to retry or ESC for menu", LIGHT_GRAY)
         self.screen.blit(controls_text, (SCREEN_WIDTH // 2 - controls_text.get_width() // 2, 500))
        
     def draw_settings(self):
         self.background.draw(self.screen)
        
-        title_font = pygame.font.SysFont(None, 60)
-        title_text = title_font.render("SETTINGS", True, WHITE)
+        title_font = fonts.get(60)
+        title_text = text_cache.render(title_font, "SETTINGS", WHITE)
         self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 100))
        
-        speed_font = pygame.font.SysFont(None, 40)
-        speed_label = speed_font.render("Game Speed:", True, WHITE)
+        speed_font = fonts.get(40)
+        speed_label = text_cache.render(speed_font, "Game Speed:", WHITE)
         self.screen.blit(speed_label, (SCREEN_WIDTH // 2 - 300, 200))
        
-        self.speed_button.draw(self.screen)
-       
-        self.reset_score_button.draw(self.screen)
+        self.screens[GameState.SETTINGS].draw(self.screen)
        
-        esc_font = pygame.font.SysFont(None, 30)
-        esc_text = esc_font.render("Press ESC to go back", True, LIGHT_GRAY)
-        self.screen.blit(esc_text, (SCREEN_WIDTH // 2 - esc_text.get_width() // 2, 500))
+        self.draw_esc_hint(500)
        
     def draw_highscore(self):
         self.background.draw(self.screen)
        
-        title_font = pygame.font.SysFont(None, 60)
-        title_text = title_font.render("HIGHSCORE", True, WHITE)
-        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 50))
+        title_font = fonts.get(60)
+        title_text = text_cache.render(title_font, "HIGHSCORE", WHITE)
+        self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 30))
        
-        score_font = pygame.font.SysFont(None, 80)
-        score_text = score_font.render(f"{self.highscore}", True, GOLD)
-        self.screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, 200))
-       
-        esc_font = pygame.font.SysFont(None, 30)
-        esc_text = esc_font.render("Press ESC to go back", True, LIGHT_GRAY)
-        self.screen.blit(esc_text, (SCREEN_WIDTH // 2 - esc_text.get_width() // 2, 500))
+        self.mark_choice(self.tab_choices, self.leaderboard_mode)
+        self.screens[GameState.HIGHSCORE].draw(self.screen)
+               
+        header_font = fonts.get(32)
+        row_font = fonts.get(25)
+        mode = self.leaderboard_mode.name
+       
+        # Top runs for the selected mode
+        top_panel = pygame.Rect(40, 150, 340, 330)
+        pygame.draw.rect(self.screen, DARK_BLUE, top_panel, border_radius=10)
+        pygame.draw.rect(self.screen, WHITE, top_panel, 2, border_radius=10)
+        header = text_cache.render(header_font, f"Top {LEADERBOARD_SIZE}  -  best {self.leaderboard.best(mode)}", GOLD)
+        self.screen.blit(header, (top_panel.x + 15, top_panel.y + 12))
+       
+        top_runs = self.leaderboard.top(mode)
+        if not top_runs:
+            empty_text = text_cache.render(row_font, "No runs yet", LIGHT_GRAY)
+            self.screen.blit(empty_text, (top_panel.x + 15, top_panel.y + 50))
+        for rank, run in enumerate(top_runs, 1):
+            y = top_panel.y + 45 + (rank - 1) * 28
+            score_text = text_cache.render(row_font, f"{rank:>2}.  {run['score']}", WHITE)
+            skin_text = text_cache.render(row_font, run["skin"], LIGHT_GRAY)
+            self.screen.blit(score_text, (top_panel.x + 15, y))
+            self.screen.blit(skin_text, (top_panel.right - 15 - skin_text.get_width(), y))
+           
+        # Paged history of every run, newest first
+        history_panel = pygame.Rect(420, 150, 340, 330)
+        pygame.draw.rect(self.screen, DARK_BLUE, history_panel, border_radius=10)
+        pygame.draw.rect(self.screen, WHITE, history_panel, 2, border_radius=10)
+        header = text_cache.render(header_font, f"Recent runs ({self.history_count})", WHITE)
+        self.screen.blit(header, (history_panel.x + 15, history_panel.y + 12))
+       
+        rows = self.history_pages[self.history_page] if self.history_page < len(self.history_pages) else []
+        for i, (_, left, right) in enumerate(rows):
+            y = history_panel.y + 45 + i * 28
+            left_text = text_cache.render(row_font, left, WHITE)
+            right_text = text_cache.render(row_font, right, LIGHT_GRAY)
+            self.screen.blit(left_text, (history_panel.x + 15, y))
+            self.screen.blit(right_text, (history_panel.right - 15 - right_text.get_width(), y))
+           
+        page_text = text_cache.render(row_font, f"Page {self.history_page + 1}", LIGHT_GRAY)
+        self.screen.blit(page_text, (history_panel.centerx - page_text.get_width() // 2, 442))
        
-    def spawn_pipe(self):
-        gap_y = random.randint(100, SCREEN_HEIGHT - 200)
-        pipe = Pipe(SCREEN_WIDTH, gap_y, self.game_speed)
-        self.pipes.append(pipe)
+        self.draw_esc_hint(520)
        
     def handle_skin_card_click(self, mouse_pos):
-        popup_width, popup_height = 700, 550
-        popup_x, popup_y = SCREEN_WIDTH // 2 - popup_width // 2, SCREEN_HEIGHT // 2 - popup_height // 2
-       
-        skin_list = list(BirdSkin)
-        categories = {}
-        for skin in skin_list:
-            category = skin.value["category"]
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(skin)
-       
-        y_offset = popup_y + 90
-        for category, skins in categories.items():
-            y_offset += 35
-           
-            for i, skin in enumerate(skins):
-                row = i // 3
-                col = i % 3
+        card = self.skin_grid.card_at(mouse_pos)
+        if not card:
+            return
+        skin = card.skin
+        if skin.name in self.owned_skins:
+            self.current_bird_skin = skin
+            if self.bird:
+                self.bird.skin = skin
+            self.store.set("equipped_skin", skin.name)
+        else:
+            if self.coins >= skin.price:
+                self.coins -= skin.price
+                self.owned_skins.add(skin.name)
+                self.current_bird_skin = skin
+                if self.bird:
+                    self.bird.skin = skin
+                self.store.set("coins", self.coins)
+                self.store.unlock("unlocked_skins", skin.name)
+                self.store.set("equipped_skin", skin.name)
                
-                card_x = popup_x + 30 + col * 200
-                card_y = y_offset + row * 140
+    def handle_events(self):
+        mouse_click = False
+        for event in pygame.event.get():
+            # Anything that can change a static screen's content forces a full redraw
+            if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEWHEEL, pygame.VIDEOEXPOSE,
+                              pygame.VIDEORESIZE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                self.ui_version += 1
+                if event.type not in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEWHEEL):
+                    self.display.invalidate()
                
-                card_center = (card_x + 70, card_y + 70)
-                distance = math.sqrt((mouse_pos[0] - card_center[0])**2 + (mouse_pos[1] - card_center[1])**2)
+            if event.type == pygame.QUIT:
+                self.running = False
+                self.save_data()
                
-                if distance < 50:
-                    if skin.value["unlocked"]:
-                        self.current_bird_skin = skin
-                        if self.bird:
-                            self.bird.skin = skin
-                    else:
-                        if self.coins >= skin.value["price"]:
-                            self.coins -= skin.value["price"]
-                            skin.value["unlocked"] = True
-                            self.current_bird_skin = skin
-                            if self.bird:
-                                self.bird.skin = skin
-                    return
-                   
-            y_offset += (len(skins) // 3 + 1) * 140
-           
-    def run(self):
-        running = True
-        mouse_click = False
-       
-        while running:
-            mouse_pos = pygame.mouse.get_pos()
-            mouse_click = False
-           
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                    self.save_data()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    self.profiler.enable(not self.profiler.enabled)
+                elif event.key == pygame.K_F4:
+                    self.toggle_trace()
                    
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        if self.state in [GameState.BACKGROUND_THEME, GameState.TRAIL_EFFECT,
-                                        GameState.SKIN_SELECTOR, GameState.SETTINGS,
-                                        GameState.HIGHSCORE, GameState.MODE_SELECT]:
-                            self.state = GameState.MAIN_MENU
-                            self.save_data()
-                        elif self.state == GameState.GAME_OVER:
-                            self.state = GameState.MAIN_MENU
-                            self.save_data()
-                           
-                    if self.state == GameState.PLAYING:
-                        if event.key == pygame.K_SPACE:
-                            if self.bird and self.bird.alive:
-                                self.bird.jump()
+                if event.key == pygame.K_ESCAPE:
+                    if self.state in [GameState.BACKGROUND_THEME, GameState.TRAIL_EFFECT,
+                                    GameState.SKIN_SELECTOR, GameState.SETTINGS,
+                                    GameState.HIGHSCORE, GameState.MODE_SELECT]:
+                        self.state = GameState.MAIN_MENU
+                        self.save_data()
                     elif self.state == GameState.GAME_OVER:
-                        if event.key == pygame.K_r:
-                            self.state = GameState.PLAYING
-                            self.reset_game()
-                    elif self.state == GameState.MAIN_MENU:
-                        if event.key == pygame.K_RETURN:
-                            self.state = GameState.PLAYING
-                            self.reset_game()
-                           
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    mouse_click = True
-                   
-                    if self.state == GameState.PLAYING:
+                        self.state = GameState.MAIN_MENU
+                        self.save_data()
+                       
+                if self.state == GameState.PLAYING:
+                    if event.key == pygame.K_SPACE:
                         if self.bird and self.bird.alive:
-                            self.bird.jump()
-                           
-            if self.state == GameState.MAIN_MENU:
-                self.play_button.update(mouse_pos)
-                self.modes_button.update(mouse_pos)
-                self.highscore_button.update(mouse_pos)
-                self.settings_button.update(mouse_pos)
-                self.skin_button.update(mouse_pos)
-                self.background_button.update(mouse_pos)
-                self.trail_button.update(mouse_pos)
-               
-                if mouse_click:
-                    if self.play_button.is_clicked(mouse_pos, True):
+                            self.pending_jump = True
+                elif self.state == GameState.GAME_OVER:
+                    if event.key == pygame.K_r:
                         self.state = GameState.PLAYING
                         self.reset_game()
-                    elif self.modes_button.is_clicked(mouse_pos, True):
-                        self.state = GameState.MODE_SELECT
-                    elif self.highscore_button.is_clicked(mouse_pos, True):
-                        self.state = GameState.HIGHSCORE
-                    elif self.settings_button.is_clicked(mouse_pos, True):
-                        self.state = GameState.SETTINGS
-                    elif self.skin_button.is_clicked(mouse_pos, True):
-                        self.state = GameState.SKIN_SELECTOR
-                    elif self.background_button.is_clicked(mouse_pos, True):
-                        self.state = GameState.BACKGROUND_THEME
-                    elif self.trail_button.is_clicked(mouse_pos, True):
-                        self.state = GameState.TRAIL_EFFECT
-                       
-            elif self.state == GameState.BACKGROUND_THEME:
-                self.day_button.update(mouse_pos)
-                self.night_button.update(mouse_pos)
-                self.storm_button.update(mouse_pos)
-               
-                if mouse_click:
-                    if self.day_button.is_clicked(mouse_pos, True):
-                        self.current_theme = BackgroundTheme.DAY
-                        self.background.set_theme(self.current_theme)
-                    elif self.night_button.is_clicked(mouse_pos, True):
-                        self.current_theme = BackgroundTheme.NIGHT
-                        self.background.set_theme(self.current_theme)
-                    elif self.storm_button.is_clicked(mouse_pos, True):
-                        self.current_theme = BackgroundTheme.STORM
-                        self.background.set_theme(self.current_theme)
+                elif self.state == GameState.MAIN_MENU:
+                    if event.key == pygame.K_RETURN:
+                        self.state = GameState.PLAYING
+                        self.reset_game()
+                elif self.state == GameState.HIGHSCORE:
+                    if event.key == pygame.K_LEFT:
+                        self.change_leaderboard_mode(-1)
+                    elif event.key == pygame.K_RIGHT:
+                        self.change_leaderboard_mode(1)
+                    elif event.key == pygame.K_PAGEUP:
+                        self.change_history_page(-1)
+                    elif event.key == pygame.K_PAGEDOWN:
+                        self.change_history_page(1)
+                elif self.state == GameState.SKIN_SELECTOR:
+                    if event.key == pygame.K_UP:
+                        self.skin_grid.scroll_by(-SkinGrid.SCROLL_STEP)
+                    elif event.key == pygame.K_DOWN:
+                        self.skin_grid.scroll_by(SkinGrid.SCROLL_STEP)
+                    elif event.key == pygame.K_PAGEUP:
+                        self.skin_grid.scroll_by(-self.skin_grid.viewport.height)
+                    elif event.key == pygame.K_PAGEDOWN:
+                        self.skin_grid.scroll_by(self.skin_grid.viewport.height)
                        
-            elif self.state == GameState.TRAIL_EFFECT:
-                self.sparkle_button.update(mouse_pos)
-                self.fire_button.update(mouse_pos)
-                self.rainbow_button.update(mouse_pos)
+            elif event.type == pygame.MOUSEWHEEL:
+                if self.state == GameState.SKIN_SELECTOR:
+                    self.skin_grid.scroll_by(-event.y * SkinGrid.SCROLL_STEP)
+                   
+            # Wheel notches also arrive as buttons 4 and 5; they scroll, they don't click
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button not in (4, 5):
+                mouse_click = True
                
-                if mouse_click:
-                    if self.sparkle_button.is_clicked(mouse_pos, True):
-                        self.trail_effect = TrailEffect.SPARKLE
-                    elif self.fire_button.is_clicked(mouse_pos, True):
-                        self.trail_effect = TrailEffect.FIRE
-                    elif self.rainbow_button.is_clicked(mouse_pos, True):
-                        self.trail_effect = TrailEffect.RAINBOW
+                if self.state == GameState.PLAYING:
+                    if self.bird and self.bird.alive:
+                        self.pending_jump = True
                        
-            elif self.state == GameState.MODE_SELECT:
-                self.easy_mode_button.update(mouse_pos)
-                self.normal_mode_button.update(mouse_pos)
-                self.hard_mode_button.update(mouse_pos)
+        return mouse_click
+       
+    def update_ui(self, mouse_pos, mouse_click):
+        state = self.state
+        screen = self.screens.get(state)
+        if screen is not self.active_screen:
+            if self.active_screen:
+                self.active_screen.clear_hover()
+            self.active_screen = screen
+           
+        if screen:
+            screen.pointer(mouse_pos)
+            if mouse_click:
+                screen.click(mouse_pos)
+        elif state == GameState.SKIN_SELECTOR and mouse_click:
+            self.handle_skin_card_click(mouse_pos)
+           
+    # One fixed simulation step of SIM_DT seconds; everything that moves or animates advances here
+    def update_simulation(self):
+        scope = self.profiler.scope
+        if self.state == GameState.MAIN_MENU:
+            with scope("background.update"):
+                self.background.update()
+            self.title_bounce += 0.1 * self.title_bounce_dir
+            if self.title_bounce > 5 or self.title_bounce < -5:
+                self.title_bounce_dir *= -1
                
-                if mouse_click:
-                    if self.easy_mode_button.is_clicked(mouse_pos, True):
-                        self.game_speed = GameSpeed.EASY
-                        self.speed_button.current_index = 0
-                        self.state = GameState.MAIN_MENU
-                        self.save_data()
-                    elif self.normal_mode_button.is_clicked(mouse_pos, True):
-                        self.game_speed = GameSpeed.NORMAL
-                        self.speed_button.current_index = 1
-                        self.state = GameState.MAIN_MENU
-                        self.save_data()
-                    elif self.hard_mode_button.is_clicked(mouse_pos, True):
-                        self.game_speed = GameSpeed.HARD
-                        self.speed_button.current_index = 2
-                        self.state = GameState.MAIN_MENU
-                        self.save_data()
-                       
-            elif self.state == GameState.SKIN_SELECTOR:
-                if mouse_click:
-                    self.handle_skin_card_click(mouse_pos)
-                   
-            elif self.state == GameState.SETTINGS:
-                self.speed_button.update(mouse_pos, mouse_click)
-                self.reset_score_button.update(mouse_pos)
+        elif self.state == GameState.PLAYING:
+            with scope("background.update"):
+                self.background.update()
+            with scope("particles.update"):
+                self.particles.update()
+            if self.bird and self.bird.alive:
+                if self.playback:
+                    self.pending_jump = self.playback.jump_at(self.sim.tick)
+                elif self.pending_jump:
+                    self.recorder.record_jump(self.sim.tick)
+                # Bird and pipe movement, scoring and collisions
+                with scope("physics"):
+                    _, _, done = self.sim.step(self.pending_jump)
+                self.pending_jump = False
+                if self.ghost:
+                    with scope("ghost.update"):
+                        self.ghost.update()
+                with scope("trail.update"):
+                    self.trail.update(self.trail_effect, self.bird, self.sim.pipe_speed)
                
-                if mouse_click:
-                    if self.speed_button.update(mouse_pos, mouse_click):
-                        if self.speed_button.current_index == 0:
-                            self.game_speed = GameSpeed.EASY
-                        elif self.speed_button.current_index == 1:
-                            self.game_speed = GameSpeed.NORMAL
-                        else:
-                            self.game_speed = GameSpeed.HARD
+                if self.sim.score != self.score:
+                    if not self.playback:
+                        self.coins += self.sim.score - self.score
+                    self.score = self.sim.score
                    
-                    if self.reset_score_button.is_clicked(mouse_pos, True):
-                        self.highscore = 0
-                           
-            elif self.state == GameState.PLAYING:
-                if self.bird and self.bird.alive:
-                    self.bird.update()
+                if done and self.playback:
+                    self.create_explosion(self.bird.x, self.bird.y)
+                    self.state = GameState.GAME_OVER
+                elif done:
+                    self.create_explosion(self.bird.x, self.bird.y)
+                    # Release the best replay's file before this run may replace it
+                    if self.ghost:
+                        self.ghost.close()
+                    if self.score > self.highscore:
+                        self.highscore = self.score
+                    self.store.set("coins", self.coins)
+                    self.store.set("highscore", self.highscore)
+                    self.record_run()
+                    self.state = GameState.GAME_OVER
                    
-                    current_time = pygame.time.get_ticks()
-                    if current_time - self.pipe_timer > self.pipe_interval:
-                        self.spawn_pipe()
-                        self.pipe_timer = current_time
-                       
-                    pipes_to_remove = []
-                    for pipe in self.pipes:
-                        pipe.update()
-                       
-                        if pipe.x < -pipe.width:
-                            pipes_to_remove.append(pipe)
-                           
-                        if not pipe.passed and pipe.x < self.bird.x:
-                            pipe.passed = True
-                            self.score += 1
-                            self.coins += 1
-                           
-                        if (self.bird.get_rect().colliderect(pipe.get_top_rect()) or
-                            self.bird.get_rect().colliderect(pipe.get_bottom_rect())):
-                            self.create_explosion(self.bird.x, self.bird.y)
-                            self.bird.alive = False
-                               
-                    for pipe in pipes_to_remove:
-                        self.pipes.remove(pipe)
-                           
-                    if self.bird.y > SCREEN_HEIGHT - 100 - self.bird.radius:
-                        self.create_explosion(self.bird.x, self.bird.y)
-                        self.bird.alive = False
-                           
-                    if not self.bird.alive:
-                        if self.score > self.highscore:
-                            self.highscore = self.score
-                        self.state = GameState.GAME_OVER
-                       
-            elif self.state == GameState.GAME_OVER:
-                self.retry_button.update(mouse_pos)
-                self.menu_button.update(mouse_pos)
-               
-                if mouse_click:
-                    if self.retry_button.is_clicked(mouse_pos, True):
-                        self.state = GameState.PLAYING
-                        self.reset_game()
-                    elif self.menu_button.is_clicked(mouse_pos, True):
-                        self.state = GameState.MAIN_MENU
-                        self.save_data()
-                       
-            if self.state == GameState.MAIN_MENU:
-                self.draw_main_menu()
-            elif self.state == GameState.BACKGROUND_THEME:
-                self.draw_background_theme_popup()
-            elif self.state == GameState.TRAIL_EFFECT:
-                self.draw_trail_effect_popup()
-            elif self.state == GameState.MODE_SELECT:
-                self.draw_mode_select_popup()
-            elif self.state == GameState.SKIN_SELECTOR:
-                self.draw_skin_selector_popup()
-            elif self.state == GameState.PLAYING:
-                self.draw_game()
-            elif self.state == GameState.GAME_OVER:
-                self.draw_game_over()
-            elif self.state == GameState.SETTINGS:
-                self.draw_settings()
-            elif self.state == GameState.HIGHSCORE:
-                self.draw_highscore()
+           
+        elif self.state == GameState.GAME_OVER:
+            with scope("background.update"):
+                self.background.update()
+            with scope("particles.update"):
+                self.particles.update()
+            if self.game_over_alpha < 180:
+                self.game_over_alpha += 5
                
-            pygame.display.flip()
-            self.clock.tick(FPS)
+    # alpha is how far rendering is between the last two simulation steps (0..1)
+    def render(self, alpha=1.0):
+        if self.state not in POPUP_SCREENS:
+            self.backdrop_state = None
+           
+        if self.state == GameState.MAIN_MENU:
+            self.draw_main_menu()
+        elif self.state == GameState.BACKGROUND_THEME:
+            self.draw_background_theme_popup()
+        elif self.state == GameState.TRAIL_EFFECT:
+            self.draw_trail_effect_popup()
+        elif self.state == GameState.MODE_SELECT:
+            self.draw_mode_select_popup()
+        elif self.state == GameState.SKIN_SELECTOR:
+            self.draw_skin_selector_popup()
+        elif self.state == GameState.PLAYING:
+            self.draw_game(alpha)
+        elif self.state == GameState.GAME_OVER:
+            self.draw_game_over()
+        elif self.state == GameState.SETTINGS:
+            self.draw_settings()
+        elif self.state == GameState.HIGHSCORE:
+            self.draw_highscore()
            
+       
+    # The parts of a static screen that can change without input: hovered buttons, and
+    # the flapping previews on the skin cards in view
+    def dirty_regions(self):
+        screen = self.screens.get(self.state)
+        regions = [(widget.rect, widget.state_key()) for widget in screen.widgets] if screen else []
+        if self.state == GameState.SKIN_SELECTOR:
+            # A skin image finishing its decode also changes a preview
+            state = (self.preview_flap_index(), assets.version)
+            regions.extend((rect, state) for rect in self.skin_grid.visible_card_rects())
+        return regions
+       
+    # While the profiler is on, every screen is redrawn in full so its overlay stays current
+    def present(self, alpha=1.0):
+        scope = self.profiler.scope
+        if self.dirty_rects and self.state in STATIC_SCREENS and not self.profiler.enabled:
+            self.dirty.present(self.display, (self.state, self.ui_version), self.dirty_regions(),
+                               lambda: self.render(alpha))
+        else:
+            self.dirty.invalidate()
+            with scope("render"):
+                self.render(alpha)
+            if self.profiler.enabled:
+                self.profiler_overlay.draw(self.screen)
+            with scope("flip"):
+                self.display.flip()
+           
+    # Start recording a Chrome trace, or stop and write it to TRACE_PATH in the save directory
+    def toggle_trace(self):
+        if self.profiler.trace is None:
+            self.profiler.start_trace(os.path.join(self.save_dir, TRACE_PATH))
+        else:
+            path = self.profiler.stop_trace()
+            if path:
+                print(f"Wrote frame trace to {path}", file=sys.stderr)
+           
+    # max_frames stops the loop after that many frames (for headless runs)
+    def run(self, max_frames=None):
+        self.running = True
+        accumulator = 0.0
+        last_time = time.perf_counter()
+        frames = 0
+        # Fonts the menus use are loaded one per frame once the first frame is up,
+        # rather than all before the window shows anything
+        preload = list(FONT_PRELOAD)
+       
+        # Saves still queued on the writer are flushed even if a frame raises
+        try:
+            while self.running:
+                now = time.perf_counter()
+                accumulator += min(now - last_time, MAX_FRAME_TIME)
+                last_time = now
+                self.profiler.begin_frame()
+               
+                with self.profiler.scope("events"):
+                    mouse_pos = self.display.to_logical(pygame.mouse.get_pos())
+                    mouse_click = self.handle_events()
+                    self.update_ui(mouse_pos, mouse_click)
+                   
+                with self.profiler.scope("update"):
+                    while accumulator >= SIM_DT:
+                        self.update_simulation()
+                        accumulator -= SIM_DT
+                       
+                self.present(accumulator / SIM_DT)
+                # The frame is the work done; the wait in clock.tick is left out
+                self.profiler.end_frame()
+                if preload:
+                    fonts.preload([preload.pop()])
+                self.clock.tick(self.fps)
+                frames += 1
+                if max_frames is not None and frames >= max_frames:
+                    self.running = False
+        finally:
+            self.close()
+       
+    def close(self):
+        if self.profiler.trace is not None:
+            self.toggle_trace()
+        self.close_ghost()
+        self.store.close()
+        self.writer.close()
         pygame.quit()
-        sys.exit()
+       
+def parse_resolution(text):
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive size, got {text!r}")
+    return width, height
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sky Hopper")
+    display = parser.add_mutually_exclusive_group()
+    display.add_argument("--fullscreen", action="store_true", help="fill the screen")
+    display.add_argument("--windowed", dest="fullscreen", action="store_false", help="run in a window (default)")
+    parser.add_argument("--resolution", type=parse_resolution, metavar="WxH",
+                        help="window or fullscreen size (default: 800x600 windowed, the desktop in fullscreen)")
+    parser.add_argument("--filter", dest="scale_filter", choices=sorted(Display.FILTERS), default="nearest",
+                        help="how the 800x600 frame is scaled to the window")
+    parser.add_argument("--headless", action="store_true", help="no window; render to an off-screen surface")
+    parser.add_argument("--profile", default="default", help="player profile to load")
+    parser.add_argument("--save-dir", default=".", help="directory for saves, replays and traces")
+    parser.add_argument("--fps", type=int, default=FPS, help="frame rate cap (0 for uncapped)")
+    parser.add_argument("--no-dirty-rects", dest="dirty_rects", action="store_false",
+                        help="redraw static screens in full every frame")
+    parser.add_argument("--frames", type=int, help="quit after this many frames")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="start, draw the first frame, print how long each step took and quit")
+    args = parser.parse_args(argv)
+   
+    started = time.perf_counter()
+    game = Game(profile=args.profile, dirty_rects=args.dirty_rects, fullscreen=args.fullscreen, fps=args.fps,
+                headless=args.headless, save_dir=args.save_dir, resolution=args.resolution,
+                scale_filter=args.scale_filter)
+    if args.startup_time:
+        ready = time.perf_counter()
+        game.present()
+        drawn = time.perf_counter()
+        game.close()
+        print(f"import {(started - IMPORT_STARTED) * 1000:.1f} ms, game {(ready - started) * 1000:.1f} ms, "
+              f"first frame {(drawn - ready) * 1000:.1f} ms, total {(drawn - IMPORT_STARTED) * 1000:.1f} ms")
+        return
+    game.run(args.frames)
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    main()
\ No newline at end of file
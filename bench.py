@@ -0,0 +1,379 @@
+# Sky Hopper benchmarks
+# Runs headless, e.g.:  python bench.py background --frames 600
+#
+# The screens suite renders every screen under every background theme and can keep its
+# results as a baseline to check later runs against:
+#
+#     python bench.py screens --out baseline.json
+#     python bench.py screens --out after.json --compare baseline.json
+#     python bench.py compare baseline.json after.json
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib.util
+
+from profiler import summarize, gc_collections
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GAME_PATH = os.path.join(HERE, "Sky Hopper.py")
+
+def load_game_module():
+    if "sky_hopper" in sys.modules:
+        return sys.modules["sky_hopper"]
+    spec = importlib.util.spec_from_file_location("sky_hopper", GAME_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["sky_hopper"] = module
+    spec.loader.exec_module(module)
+    return module
+
+def time_frames(frame_fn, frames, warmup=30):
+    for _ in range(warmup):
+        frame_fn()
+    samples = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        frame_fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def print_row(name, stats):
+    print(f"{name:<28} mean {stats['mean']:7.3f} ms  p50 {stats['p50']:7.3f}  "
+          f"p95 {stats['p95']:7.3f}  p99 {stats['p99']:7.3f}")
+
+# The background renderer as it was before layer caching, kept as the comparison baseline
+def legacy_background_draw(sh, renderer, screen):
+    pygame = sh.pygame
+    width, height = screen.get_size()
+    theme = renderer.theme
+    if theme == sh.BackgroundTheme.DAY:
+        screen.fill(sh.SKY_BLUE)
+        pygame.draw.circle(screen, sh.YELLOW, (100, 80), 40)
+    elif theme == sh.BackgroundTheme.NIGHT:
+        screen.fill(sh.NIGHT_BLUE)
+        pygame.draw.circle(screen, sh.SILVER, (width - 100, 80), 35)
+        pygame.draw.circle(screen, sh.NIGHT_BLUE, (width - 85, 65), 25)
+        for star in renderer.stars:
+            brightness = int(star['brightness'] * 255)
+            pygame.draw.circle(screen, (brightness, brightness, 200),
+                               (int(star['x']), int(star['y'])), star['size'])
+    else:
+        screen.fill(sh.DARK_BLUE)
+
+    cloud_color = renderer.CLOUD_COLORS[theme.name]
+    for cloud in renderer.clouds:
+        for j in range(3):
+            circle_x = cloud['x'] + j * 25
+            circle_y = cloud['y'] + (j % 2) * 15
+            cloud_surf = pygame.Surface((cloud['size'] * 2, cloud['size'] * 2), pygame.SRCALPHA)
+            pygame.draw.circle(cloud_surf, cloud_color, (cloud['size'], cloud['size']), cloud['size'])
+            screen.blit(cloud_surf, (circle_x - cloud['size'], circle_y - cloud['size']))
+
+    if theme == sh.BackgroundTheme.STORM and renderer.lightning_alpha > 0:
+        lightning_surf = pygame.Surface((width, height), pygame.SRCALPHA)
+        lightning_surf.fill((255, 255, 200, renderer.lightning_alpha))
+        screen.blit(lightning_surf, (0, 0))
+
+    pygame.draw.rect(screen, (100, 70, 30), (0, height - 100, width, 100))
+    pygame.draw.rect(screen, (80, 150, 50), (0, height - 100, width, 20))
+
+def bench_background(args):
+    sh = load_game_module()
+    screen = sh.pygame.display.set_mode((sh.SCREEN_WIDTH, sh.SCREEN_HEIGHT))
+    for theme in sh.BackgroundTheme:
+        renderer = sh.BackgroundRenderer()
+        renderer.set_theme(theme)
+        # Keep the storm flash on so the full-screen overlay path is measured
+        renderer.lightning_alpha = 150 if theme == sh.BackgroundTheme.STORM else 0
+
+        def before():
+            legacy_background_draw(sh, renderer, screen)
+
+        def after():
+            renderer.draw(screen)
+
+        old = summarize(time_frames(before, args.frames))
+        new = summarize(time_frames(after, args.frames))
+        print_row(f"{theme.name} before", old)
+        print_row(f"{theme.name} after", new)
+        if new["mean"] > 0:
+            print(f"{theme.name} speedup: {old['mean'] / new['mean']:.1f}x")
+
+def bench_particles(args):
+    sh = load_game_module()
+    screen = sh.pygame.display.set_mode((sh.SCREEN_WIDTH, sh.SCREEN_HEIGHT))
+    system = sh.ParticleSystem(capacity=args.count, use_numpy=not args.no_numpy)
+    rng = sh.random.Random(1)
+
+    def refill():
+        # Keep the pool at capacity with bursts spread across the screen
+        while len(system) < args.count:
+            system.emit(rng.uniform(0, sh.SCREEN_WIDTH), rng.uniform(0, sh.SCREEN_HEIGHT - 100),
+                        min(500, args.count - len(system)), lifetime=120, speed=2)
+
+    def frame():
+        refill()
+        system.update()
+        system.draw(screen)
+
+    refill()
+    stats = summarize(time_frames(frame, args.frames))
+    backend = "numpy" if system.use_numpy else "array"
+    print_row(f"{args.count} particles ({backend})", stats)
+    budget = 1000 / 60
+    verdict = "meets" if stats["p95"] <= budget else "misses"
+    print(f"p95 {verdict} the 60 FPS budget of {budget:.2f} ms")
+
+def bench_sim(args):
+    # Deliberately no pygame import here: the simulation must run without it
+    import simulation
+    sim = simulation.SkyHopperSim(pipe_speed=simulation.PIPE_SPEEDS[args.mode])
+    policy = simulation.scripted_policy
+    steps = episodes = 0
+    seed = 0
+    obs = sim.reset(seed)
+    start = time.perf_counter()
+    while steps < args.steps:
+        obs, reward, done = sim.step(policy(obs))
+        steps += 1
+        if done:
+            episodes += 1
+            seed += 1
+            obs = sim.reset(seed)
+    elapsed = time.perf_counter() - start
+    print(f"{steps} steps, {episodes} episodes in {elapsed:.2f} s: {steps / elapsed:,.0f} steps/sec")
+
+def bench_batch(args):
+    import simulation
+    batch = simulation.BatchSkyHopperSim(args.envs, pipe_speed=simulation.PIPE_SPEEDS[args.mode])
+    obs = batch.reset(0)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        obs, rewards, dones = batch.step(simulation.scripted_policy_batch(obs))
+    elapsed = time.perf_counter() - start
+    total = args.envs * args.steps
+    print(f"{args.envs} lanes x {args.steps} steps, {int(batch.episode.sum())} episodes in {elapsed:.2f} s: "
+          f"{total / elapsed:,.0f} steps/sec")
+
+# Each screen scenario: (name, state, setup(game, sh), per-frame step(game, sh, frame))
+def setup_playing(game, sh):
+    game.state = sh.GameState.PLAYING
+    game.reset_game(seed=1)
+
+def step_playing(game, sh, frame):
+    import simulation
+    # Keep playing through a death instead of stopping on the game over screen
+    if game.state != sh.GameState.PLAYING:
+        game.state = sh.GameState.PLAYING
+        game.reset_game(seed=frame)
+    game.pending_jump = simulation.scripted_policy(game.sim.observation())
+    game.update_simulation()
+
+def setup_game_over(game, sh):
+    setup_playing(game, sh)
+    for _ in range(120):
+        step_playing(game, sh, 0)
+    game.state = sh.GameState.GAME_OVER
+    game.game_over_alpha = 0
+
+def step_game_over(game, sh, frame):
+    # A fresh explosion every second keeps live particles on screen
+    if frame % 60 == 0:
+        game.create_explosion(game.bird.x, game.bird.y)
+    game.update_simulation()
+
+def setup_state(state):
+    def setup(game, sh):
+        game.state = getattr(sh.GameState, state)
+    return setup
+
+def setup_highscore(game, sh):
+    game.open_highscore()
+
+def step_animate(game, sh, frame):
+    game.update_simulation()
+
+SCREENS = [
+    ("MAIN_MENU", setup_state("MAIN_MENU"), step_animate),
+    ("PLAYING", setup_playing, step_playing),
+    ("GAME_OVER", setup_game_over, step_game_over),
+    ("SKIN_SELECTOR", setup_state("SKIN_SELECTOR"), step_animate),
+    ("MODE_SELECT", setup_state("MODE_SELECT"), step_animate),
+    ("BACKGROUND_THEME", setup_state("BACKGROUND_THEME"), step_animate),
+    ("TRAIL_EFFECT", setup_state("TRAIL_EFFECT"), step_animate),
+    ("SETTINGS", setup_state("SETTINGS"), step_animate),
+    ("HIGHSCORE", setup_highscore, step_animate),
+]
+
+# One frame is a simulation step plus Game.present, as in Game.run
+def bench_screen(game, sh, setup, step, frames, warmup):
+    random.seed(0)
+    game.particles.clear()
+    setup(game, sh)
+    game.dirty.invalidate()
+    for frame in range(warmup):
+        step(game, sh, frame)
+        game.present()
+    samples = []
+    blocks = 0
+    collections = gc_collections()
+    for frame in range(warmup, warmup + frames):
+        start_blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        step(game, sh, frame)
+        game.present()
+        samples.append((time.perf_counter() - start) * 1000)
+        blocks += sys.getallocatedblocks() - start_blocks
+    stats = summarize(samples)
+    stats["alloc_blocks_per_frame"] = blocks / frames
+    stats["gc_collections"] = gc_collections() - collections
+    return stats
+
+def bench_screens(args):
+    sh = load_game_module()
+    out = os.path.abspath(args.out) if args.out else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    # Saves, runs and replays from the benchmark go to a scratch directory
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="sky-hopper-bench-")
+    os.chdir(workdir)
+    game = sh.Game(profile="bench", dirty_rects=args.dirty_rects)
+    game.ghost_enabled = False
+
+    only = set(args.screens or [])
+    results = {}
+    for name, setup, step in SCREENS:
+        if only and name not in only:
+            continue
+        for theme in sh.BackgroundTheme:
+            game.current_theme = theme
+            game.background.set_theme(theme)
+            key = f"{name}/{theme.name}"
+            # Best of several passes: on a busy machine the fastest pass is the least disturbed
+            passes = [bench_screen(game, sh, setup, step, args.frames, args.warmup) for _ in range(args.repeat)]
+            results[key] = {metric: min(p[metric] for p in passes) for metric in passes[0]}
+            print_row(key, results[key])
+            print(f"{'':<28} allocs {results[key]['alloc_blocks_per_frame']:+8.1f} blocks/frame  "
+                  f"gc {results[key]['gc_collections']}")
+
+    game.close_ghost()
+    game.store.close()
+    game.writer.close()
+    os.chdir(cwd)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "frames": args.frames,
+            "repeat": args.repeat,
+            "screens": sorted(only) if only else [name for name, _, _ in SCREENS],
+            "dirty_rects": args.dirty_rects,
+            "python": platform.python_version(),
+            "pygame": sh.pygame.version.ver,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        return compare_reports(baseline, report, args.threshold, args.min_ms)
+    return 0
+
+# A screen regresses when its p50 or p95 is both threshold percent and min_ms slower
+def compare_reports(baseline, current, threshold, min_ms):
+    regressions = 0
+    print(f"{'screen':<28} {'metric':<6} {'baseline':>9} {'current':>9} {'change':>8}")
+    for key, stats in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            print(f"{key:<28} new")
+            continue
+        for metric in ("p50", "p95"):
+            old, new = base[metric], stats[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            flag = ""
+            if change > threshold and new - old > min_ms:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif change < -threshold and old - new > min_ms:
+                flag = "  faster"
+            print(f"{key:<28} {metric[:3]:<6} {old:9.3f} {new:9.3f} {change:+7.1f}%{flag}")
+    screens = set(current["meta"].get("screens", []))
+    for key in sorted(baseline["results"].keys() - current["results"].keys()):
+        if key.split("/")[0] in screens:
+            print(f"{key:<28} missing from the current run")
+    print(f"{regressions} regression(s) over {threshold:.0f}% and {min_ms} ms")
+    return 1 if regressions else 0
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    return compare_reports(baseline, current, args.threshold, args.min_ms)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sky Hopper benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    background = sub.add_parser("background", help="BackgroundRenderer.draw per theme, before and after layer caching")
+    background.add_argument("--frames", type=int, default=600)
+    background.set_defaults(func=bench_background)
+
+    particles = sub.add_parser("particles", help="ParticleSystem update + draw with a full pool of live particles")
+    particles.add_argument("--count", type=int, default=10000)
+    particles.add_argument("--frames", type=int, default=300)
+    particles.add_argument("--no-numpy", action="store_true", help="use the array.array fallback")
+    particles.set_defaults(func=bench_particles)
+
+    sim = sub.add_parser("sim", help="headless SkyHopperSim steps/sec with the scripted policy")
+    sim.add_argument("--steps", type=int, default=1000000)
+    sim.add_argument("--mode", choices=["EASY", "NORMAL", "HARD"], default="NORMAL")
+    sim.set_defaults(func=bench_sim)
+
+    batch = sub.add_parser("batch", help="BatchSkyHopperSim lane-steps/sec with the vectorized scripted policy")
+    batch.add_argument("--envs", type=int, default=4096)
+    batch.add_argument("--steps", type=int, default=2000)
+    batch.add_argument("--mode", choices=["EASY", "NORMAL", "HARD"], default="NORMAL")
+    batch.set_defaults(func=bench_batch)
+
+    screens = sub.add_parser("screens", help="every screen under every background theme: frame times and allocations")
+    screens.add_argument("--frames", type=int, default=300)
+    screens.add_argument("--warmup", type=int, default=30)
+    screens.add_argument("--repeat", type=int, default=3, help="passes per screen; the best is kept")
+    screens.add_argument("--screens", nargs="+", choices=[name for name, _, _ in SCREENS],
+                         help="only these screens")
+    screens.add_argument("--dirty-rects", action="store_true",
+                         help="present static screens with dirty rectangles, as the game does")
+    screens.add_argument("--out", help="write the results to this JSON file")
+    screens.add_argument("--compare", help="baseline JSON to check against; exits 1 on a regression")
+    screens.add_argument("--threshold", type=float, default=15.0, help="percent slowdown that counts")
+    screens.add_argument("--min-ms", type=float, default=0.05, help="ignore changes smaller than this")
+    screens.set_defaults(func=bench_screens)
+
+    compare = sub.add_parser("compare", help="compare two screens result files; exits 1 on a regression")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=15.0)
+    compare.add_argument("--min-ms", type=float, default=0.05)
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    sys.exit(args.func(args) or 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Sky Hopper content catalog.
+# Skins, and the menu entries for background themes and trail effects, come from a JSON
+# manifest (catalog.json) instead of code. Entries are immutable; which skins a profile
+# owns lives in its save data. Skin images are optional and are decoded on a background
+# thread the first time they are shown, so startup cost doesn't grow with the catalog.
+import os
+import sys
+import json
+import queue
+import threading
+from collections import namedtuple
+
+SkinEntry = namedtuple("SkinEntry", "key name price color category image")
+# Themes and trails are drawn by code; an entry names the built-in style by its key
+# and says how its button looks in the menu
+MenuEntry = namedtuple("MenuEntry", "key name color hover_color outline")
+
+class CatalogError(ValueError):
+    pass
+
+def parse_color(value, where):
+    if not isinstance(value, (list, tuple)) or len(value) not in (3, 4) or \
+            not all(isinstance(c, int) and 0 <= c <= 255 for c in value):
+        raise CatalogError(f"{where}: expected a color as [r, g, b], got {value!r}")
+    return tuple(value)
+
+def parse_skin(item, base_dir, index):
+    where = f"skins[{index}]"
+    try:
+        image = item.get("image")
+        return SkinEntry(
+            key=str(item["key"]),
+            name=str(item["name"]),
+            price=int(item.get("price", 0)),
+            color=parse_color(item["color"], where),
+            category=str(item.get("category", "Classic")),
+            image=os.path.join(base_dir, image) if image else None,
+        )
+    except CatalogError:
+        raise
+    except (KeyError, TypeError, ValueError) as e:
+        raise CatalogError(f"{where}: {e!r}")
+
+def parse_menu_entry(item, section, index):
+    where = f"{section}[{index}]"
+    try:
+        color = parse_color(item["color"], where)
+        return MenuEntry(
+            key=str(item["key"]),
+            name=str(item["name"]),
+            color=color,
+            hover_color=parse_color(item.get("hover_color", color), where),
+            outline=parse_color(item.get("outline", (255, 255, 0)), where),
+        )
+    except (KeyError, TypeError) as e:
+        raise CatalogError(f"{where}: {e!r}")
+
+class Catalog:
+    def __init__(self, skins, themes=(), trails=(), starter=None):
+        self.skins = tuple(skins)
+        self.themes = tuple(themes)
+        self.trails = tuple(trails)
+        if not self.skins:
+            raise CatalogError("the catalog has no skins")
+        self.by_key = {}
+        self.by_name = {}
+        for skin in self.skins:
+            if skin.key in self.by_key or skin.name in self.by_name:
+                raise CatalogError(f"duplicate skin {skin.key!r} / {skin.name!r}")
+            self.by_key[skin.key] = skin
+            self.by_name[skin.name] = skin
+        # Every profile owns the starter skin and wears it until it picks another
+        self.starter = self.by_key.get(starter) if starter else self.skins[0]
+        if self.starter is None:
+            raise CatalogError(f"starter skin {starter!r} is not in the catalog")
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CatalogError(f"could not read catalog {path}: {e}")
+        base_dir = os.path.dirname(os.path.abspath(path))
+        return cls(
+            [parse_skin(item, base_dir, i) for i, item in enumerate(manifest.get("skins", []))],
+            [parse_menu_entry(item, "themes", i) for i, item in enumerate(manifest.get("themes", []))],
+            [parse_menu_entry(item, "trails", i) for i, item in enumerate(manifest.get("trails", []))],
+            manifest.get("starter"),
+        )
+
+# Decodes images on a daemon thread. get() never blocks: it returns the image once it
+# is ready and None until then (or for good, if it failed to load). version goes up
+# each time an image finishes, so anything that cached a placeholder knows to redraw.
+class AssetLoader:
+    def __init__(self, decode, prepare=None):
+        self.decode = decode
+        self.prepare = prepare
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.requested = set()
+        self.decoded = {}
+        self.ready = {}
+        self.failed = set()
+        self.thread = None
+        self.version = 0
+
+    def get(self, path):
+        image = self.ready.get(path)
+        if image is not None or path in self.failed:
+            return image
+        with self.lock:
+            image = self.decoded.pop(path, None)
+            if image is None:
+                if path not in self.requested:
+                    self.requested.add(path)
+                    self.queue.put(path)
+                    if self.thread is None:
+                        self.thread = threading.Thread(target=self.run, name="asset-loader", daemon=True)
+                        self.thread.start()
+                return None
+        # Finished on the loader thread; anything that must happen on the main
+        # thread (such as converting to the display format) happens here, once
+        if self.prepare:
+            image = self.prepare(image)
+        self.ready[path] = image
+        return image
+
+    def pending(self):
+        with self.lock:
+            return len(self.requested) - len(self.ready) - len(self.failed)
+
+    def run(self):
+        while True:
+            path = self.queue.get()
+            try:
+                image = self.decode(path)
+            except Exception as e:
+                print(f"Could not load {path}: {e}", file=sys.stderr)
+                with self.lock:
+                    self.failed.add(path)
+                    self.version += 1
+                continue
+            with self.lock:
+                self.decoded[path] = image
+                self.version += 1
@@ -0,0 +1,62 @@
+# Bird-vs-pipe collision tests for Sky Hopper.
+# Everything here is interval math on plain numbers, so a simulation step builds no
+# rects or other objects. Pipes enter at the right edge and all scroll left at the same
+# speed, so a list or deque of them in spawn order is also sorted by x, and near() only
+# has to walk it as far as the bird:
+#
+#     for pipe in collision.near(sim.pipes, bird.x - bird.radius, bird.x + bird.radius):
+#         if collision.box_hits_pipe(bird, pipe):
+#             ...
+#
+# box_hits_pipe is the game's rule (the bird's bounding box); circle_hits_pipe tests
+# the round bird itself, which forgives the corners of the box.
+
+# Pipes whose span across x overlaps [left, right), oldest first. The span is widened by
+# a pixel each side so exact tests that truncate coordinates to ints see every candidate.
+def near(pipes, left, right):
+    left -= 1
+    right += 1
+    for pipe in pipes:
+        if pipe.x >= right:
+            return
+        if pipe.x + pipe.width > left:
+            yield pipe
+
+# Same result as pygame.Rect.colliderect between the bird's bounding box and either pipe
+# half: coordinates truncate to ints and touching edges don't count.
+def box_hits_pipe(bird, pipe):
+    left = int(bird.x - bird.radius)
+    top = int(bird.y - bird.radius)
+    size = int(bird.radius * 2)
+    pipe_left = int(pipe.x)
+    if left >= pipe_left + pipe.width or pipe_left >= left + size:
+        return False
+    gap_top = int(pipe.gap_y)
+    if top < gap_top and gap_top > 0:
+        return True
+    return top + size > int(pipe.gap_y + pipe.gap_height)
+
+# True when the circle at (x, y) overlaps the axis-aligned box; touching doesn't count.
+# top or bottom may be infinite for a box that runs off the screen.
+def circle_hits_rect(x, y, radius, left, top, right, bottom):
+    dx = x - min(max(x, left), right)
+    dy = y - min(max(y, top), bottom)
+    return dx * dx + dy * dy < radius * radius
+
+# The bird as a circle against either pipe half, each running off the top or bottom
+def circle_hits_pipe(bird, pipe):
+    x, y, radius = bird.x, bird.y, bird.radius
+    left = pipe.x
+    right = left + pipe.width
+    if x + radius <= left or x - radius >= right:
+        return False
+    gap_top = pipe.gap_y
+    gap_bottom = gap_top + pipe.gap_height
+    # A circle that stays between the gap's top and bottom rows can't touch either half
+    if y - radius >= gap_top and y + radius <= gap_bottom:
+        return False
+    if gap_top > 0 and circle_hits_rect(x, y, radius, left, float("-inf"), right, gap_top):
+        return True
+    return circle_hits_rect(x, y, radius, left, gap_bottom, right, float("inf"))
+
+HITBOXES = {"box": box_hits_pipe, "circle": circle_hits_pipe}
@@ -0,0 +1,187 @@
+# Frame-time profiler for Sky Hopper.
+# Code marks its stages with named scopes:
+#
+#     with profiler.scope("background.draw"):
+#         ...
+#
+# and the game loop brackets each frame with begin_frame()/end_frame(). The profiler keeps
+# the last `window` frames of every scope for p50/p95/p99, counts allocations and garbage
+# collections per frame, and can record every scope of every frame as a Chrome trace
+# (load it in chrome://tracing or https://ui.perfetto.dev).
+#
+# While disabled, scope() hands back one shared object whose enter/exit do nothing, so
+# instrumented code costs an attribute check and an empty with-block.
+import gc
+import sys
+import json
+import math
+import time
+from collections import deque
+
+perf_counter = time.perf_counter
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(math.ceil(pct / 100 * len(sorted_samples))) - 1)
+    return sorted_samples[max(0, index)]
+
+class NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SCOPE = NullScope()
+
+class Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = perf_counter()
+        profiler = self.profiler
+        totals = profiler.totals
+        totals[self.name] = totals.get(self.name, 0.0) + (end - self.start)
+        if profiler.trace is not None:
+            profiler.trace.append((self.name, self.start, end - self.start))
+        return False
+
+class Profiler:
+    def __init__(self, window=240, enabled=False):
+        self.window = window
+        self.enabled = enabled
+        self.scopes = {}
+        # Seconds spent in each scope so far this frame
+        self.totals = {}
+        # Milliseconds per frame for the last `window` frames, by scope
+        self.history = {}
+        self.frame_times = deque(maxlen=window)
+        self.allocations = deque(maxlen=window)
+        self.collections = deque(maxlen=window)
+        self.frames = 0
+        self.frame_start = None
+        self.blocks_start = 0
+        self.gc_start = 0
+        # (name, start, duration) of every scope while a trace is being recorded
+        self.trace = None
+        self.trace_path = None
+        self.trace_frames = []
+        self.trace_limit = None
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        self.frame_start = None
+        self.totals.clear()
+        if not enabled:
+            self.stop_trace()
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = Scope(self, name)
+        return scope
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.totals.clear()
+        self.blocks_start = sys.getallocatedblocks()
+        self.gc_start = gc_collections()
+        self.frame_start = perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        end = perf_counter()
+        self.frame_times.append((end - self.frame_start) * 1000)
+        self.allocations.append(sys.getallocatedblocks() - self.blocks_start)
+        self.collections.append(gc_collections() - self.gc_start)
+        for name, total in self.totals.items():
+            samples = self.history.get(name)
+            if samples is None:
+                samples = self.history[name] = deque(maxlen=self.window)
+            samples.append(total * 1000)
+        self.frames += 1
+
+        if self.trace is not None:
+            self.trace_frames.append((self.frame_start, end - self.frame_start, self.allocations[-1]))
+            if self.trace_limit and len(self.trace_frames) >= self.trace_limit:
+                self.stop_trace()
+
+    # {scope: {"mean": ms, "p50": ms, "p95": ms, "p99": ms, "max": ms, "frames": n}} over
+    # the rolling window, with the whole frame under "frame"
+    def stats(self):
+        result = {"frame": summarize(self.frame_times)}
+        for name, samples in self.history.items():
+            result[name] = summarize(samples)
+        return result
+
+    def allocation_stats(self):
+        return {
+            "blocks_per_frame": sum(self.allocations) / len(self.allocations) if self.allocations else 0.0,
+            "gc_per_second": sum(self.collections) * 1000 / sum(self.frame_times) if self.frame_times else 0.0,
+        }
+
+    def start_trace(self, path, max_frames=None):
+        if not self.enabled:
+            self.enable()
+        self.trace = []
+        self.trace_frames = []
+        self.trace_path = path
+        self.trace_limit = max_frames
+
+    # Write the recorded trace in Chrome's trace event format; returns the path written
+    def stop_trace(self):
+        if self.trace is None:
+            return None
+        events, frames, path = self.trace, self.trace_frames, self.trace_path
+        self.trace = None
+        self.trace_frames = []
+        if not frames:
+            return None
+        origin = frames[0][0]
+
+        def us(seconds):
+            return round(seconds * 1e6, 3)
+
+        trace_events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "main"}}]
+        for number, (start, duration, blocks) in enumerate(frames):
+            trace_events.append({"name": "frame", "cat": "frame", "ph": "X", "pid": 1, "tid": 1,
+                                 "ts": us(start - origin), "dur": us(duration), "args": {"frame": number}})
+            trace_events.append({"name": "allocated blocks", "ph": "C", "pid": 1, "tid": 1,
+                                 "ts": us(start - origin), "args": {"delta": blocks}})
+        for name, start, duration in events:
+            if start >= origin:
+                trace_events.append({"name": name, "cat": name.split(".")[0], "ph": "X", "pid": 1, "tid": 1,
+                                     "ts": us(start - origin), "dur": us(duration)})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return path
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0,
+        "frames": len(ordered),
+    }
+
+def gc_collections():
+    return sum(generation["collections"] for generation in gc.get_stats())
@@ -0,0 +1,240 @@
+# Sky Hopper replays: a run's seed, settings and jump ticks in a small binary file.
+# The simulation is deterministic for a given seed and input stream, so that is all it
+# takes to play a run again exactly:
+#
+#     python replay.py info replays/default-last.shrp
+#     python replay.py verify replays/*.shrp        # re-simulate at full speed, no rendering
+#     python replay.py play replays/default-last.shrp
+#
+# File layout, little endian:
+#   "SHRP", u8 version, u64 seed
+#   f64 pipe_speed, gravity, jump_strength, gap_height
+#   u32 pipe_interval, width, height
+#   u32 final score, u32 final tick, f64 final bird y
+#   u32 jump count, u16 metadata length, metadata (UTF-8 JSON: mode, skin, theme, ts)
+#   jump ticks, each as a LEB128 varint of the gap since the previous jump
+import os
+import sys
+import json
+import struct
+import argparse
+import itertools
+import importlib.util
+
+import simulation
+
+MAGIC = b"SHRP"
+VERSION = 1
+HEADER = struct.Struct("<4sBQ4d3I2IdIH")
+CONFIG_KEYS = ("pipe_speed", "gravity", "jump_strength", "gap_height", "pipe_interval", "width", "height")
+
+class ReplayError(ValueError):
+    pass
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def decode_varints(data, count):
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        yield value
+        count -= 1
+        if count == 0:
+            return
+        value = shift = 0
+    if count:
+        raise ReplayError("replay ends in the middle of its input stream")
+
+class Replay:
+    def __init__(self, seed, config, score, ticks, final_y, jump_count, jump_data, meta=None):
+        self.seed = seed
+        self.config = config
+        self.score = score
+        self.ticks = ticks
+        self.final_y = final_y
+        self.jump_count = jump_count
+        self.jump_data = jump_data
+        self.meta = meta or {}
+
+    # Absolute ticks at which the player jumped, decoded as they are needed
+    def iter_jumps(self):
+        tick = 0
+        for delta in decode_varints(self.jump_data, self.jump_count):
+            tick += delta
+            yield tick
+
+    def to_bytes(self):
+        meta = json.dumps(self.meta, separators=(",", ":")).encode("utf-8")
+        config = [self.config[key] for key in CONFIG_KEYS]
+        return HEADER.pack(MAGIC, VERSION, self.seed, *config, self.score, self.ticks, self.final_y,
+                           self.jump_count, len(meta)) + meta + bytes(self.jump_data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        fields, meta_len = parse_header(data)
+        meta_end = HEADER.size + meta_len
+        return cls(*fields, data[meta_end:], parse_meta(data[HEADER.size:meta_end]))
+
+# (seed, config, score, ticks, final_y, jump_count) and the metadata length
+def parse_header(data):
+    if len(data) < HEADER.size:
+        raise ReplayError("file is too short to be a replay")
+    fields = HEADER.unpack_from(data)
+    if fields[0] != MAGIC:
+        raise ReplayError("not a Sky Hopper replay")
+    if fields[1] != VERSION:
+        raise ReplayError(f"unsupported replay version {fields[1]}")
+    config = dict(zip(CONFIG_KEYS, fields[3:10]))
+    return (fields[2], config, *fields[10:14]), fields[14]
+
+def parse_meta(data):
+    try:
+        return json.loads(data.decode("utf-8")) if data else {}
+    except ValueError as e:
+        raise ReplayError(f"bad replay metadata: {e}")
+
+def load(path):
+    with open(path, "rb") as f:
+        return Replay.from_bytes(f.read())
+
+# A replay whose jumps stay on disk: only the header is read up front, and the input
+# stream is read chunk_size bytes at a time while it is being played.
+class StreamedReplay(Replay):
+    def __init__(self, path, chunk_size=256):
+        self.path = path
+        self.chunk_size = chunk_size
+        with open(path, "rb") as f:
+            fields, meta_len = parse_header(f.read(HEADER.size))
+            meta = parse_meta(f.read(meta_len))
+        super().__init__(*fields, None, meta)
+        self.data_offset = HEADER.size + meta_len
+
+    def iter_jumps(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.data_offset)
+            chunks = iter(lambda: f.read(self.chunk_size), b"")
+            tick = 0
+            for delta in decode_varints(itertools.chain.from_iterable(chunks), self.jump_count):
+                tick += delta
+                yield tick
+
+# Collects the jump ticks of a live run; finish() turns the run into a Replay
+class Recorder:
+    def __init__(self):
+        self.jump_data = bytearray()
+        self.jump_count = 0
+        self.last_tick = 0
+
+    def record_jump(self, tick):
+        encode_varint(tick - self.last_tick, self.jump_data)
+        self.last_tick = tick
+        self.jump_count += 1
+
+    def finish(self, sim, meta=None):
+        config = {key: getattr(sim, key) for key in CONFIG_KEYS}
+        return Replay(sim.seed, config, sim.score, sim.tick, float(sim.bird.y), self.jump_count,
+                      bytes(self.jump_data), meta)
+
+# Feeds a replay's inputs back one tick at a time
+class Player:
+    def __init__(self, replay):
+        self.replay = replay
+        self.jumps = replay.iter_jumps()
+        self.next_jump = next(self.jumps, None)
+
+    def jump_at(self, tick):
+        if tick != self.next_jump:
+            return False
+        self.next_jump = next(self.jumps, None)
+        return True
+
+    # Stop reading; a streamed replay closes its file
+    def close(self):
+        self.jumps.close()
+        self.next_jump = None
+
+# Run a replay through the simulation as fast as possible and return the finished sim
+def simulate(replay, **factories):
+    sim = simulation.SkyHopperSim(**replay.config, **factories)
+    sim.reset(replay.seed)
+    player = Player(replay)
+    while not sim.done and sim.tick < replay.ticks:
+        sim.step(player.jump_at(sim.tick))
+    return sim
+
+def matches(replay, sim):
+    return sim.score == replay.score and sim.tick == replay.ticks and float(sim.bird.y) == replay.final_y
+
+# True when re-simulating ends in exactly the recorded state
+def verify(replay):
+    return matches(replay, simulate(replay))
+
+def load_game_module():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sky Hopper.py")
+    spec = importlib.util.spec_from_file_location("sky_hopper", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["sky_hopper"] = module
+    spec.loader.exec_module(module)
+    return module
+
+def cmd_info(args):
+    for path in args.files:
+        r = load(path)
+        print(f"{path}: seed {r.seed}, score {r.score}, {r.ticks} ticks, {r.jump_count} jumps, "
+              f"{os.path.getsize(path)} bytes")
+        print(f"  config {r.config}")
+        if r.meta:
+            print(f"  meta {r.meta}")
+
+def cmd_verify(args):
+    failed = 0
+    for path in args.files:
+        try:
+            r = load(path)
+        except (OSError, ReplayError) as e:
+            print(f"ERROR {path}: {e}")
+            failed += 1
+            continue
+        sim = simulate(r)
+        if matches(r, sim):
+            print(f"ok    {path}: score {r.score} in {r.ticks} ticks")
+        else:
+            failed += 1
+            print(f"FAIL  {path}: recorded score {r.score} / {r.ticks} ticks / y {r.final_y!r}, "
+                  f"got {sim.score} / {sim.tick} / {float(sim.bird.y)!r}")
+    return 1 if failed else 0
+
+def cmd_play(args):
+    game_module = load_game_module()
+    game = game_module.Game()
+    game.start_replay(load(args.file))
+    game.run()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect, verify and play Sky Hopper replays")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    info = sub.add_parser("info", help="print a replay's header")
+    info.add_argument("files", nargs="+")
+    info.set_defaults(func=cmd_info)
+
+    check = sub.add_parser("verify", help="re-simulate replays headless and check they end the same way")
+    check.add_argument("files", nargs="+")
+    check.set_defaults(func=cmd_verify)
+
+    play = sub.add_parser("play", help="watch a replay in the game window at normal speed")
+    play.add_argument("file")
+    play.set_defaults(func=cmd_play)
+
+    args = parser.parse_args(argv)
+    sys.exit(args.func(args) or 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Parallel headless rollouts for tuning difficulty.
+# Plays many games with a scripted policy for every combination of physics and pipe
+# settings, spread over all cores, and streams one JSON line per finished combination:
+#
+#     python rollout.py --gravity 0.4 0.5 0.6 --pipe-speed 2 3 4 --episodes 5000
+#
+# Every combination plays the same seeds, so differences between rows come from the
+# parameters rather than from luck.
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import simulation
+
+PARAMS = ["gravity", "jump_strength", "pipe_speed", "gap_height", "pipe_interval"]
+
+def random_policy(obs):
+    return random.random() < 0.08
+
+def idle_policy(obs):
+    return False
+
+POLICIES = {
+    "scripted": simulation.scripted_policy,
+    "random": random_policy,
+    "idle": idle_policy,
+}
+
+def batch_policy(name, obs):
+    np = simulation.np
+    if name == "scripted":
+        return simulation.scripted_policy_batch(obs)
+    if name == "random":
+        return np.random.random(len(obs)) < 0.08
+    return np.zeros(len(obs), np.bool_)
+
+# Worker: play one chunk of episodes for one parameter combination
+def run_chunk(params, policy, seeds, max_ticks, engine, hitbox="box"):
+    scores = Counter()
+    ticks = 0
+    random.seed(seeds[0])
+
+    if engine == "batch":
+        batch = simulation.BatchSkyHopperSim(len(seeds), auto_reset=False, hitbox=hitbox, **params)
+        obs = batch.reset(seeds)
+        if simulation.np is not None:
+            simulation.np.random.seed(seeds[0] & 0xFFFFFFFF)
+        for _ in range(max_ticks):
+            if batch.done.all():
+                break
+            obs, rewards, dones = batch.step(batch_policy(policy, obs))
+        scores.update(batch.score.tolist())
+        ticks = int(batch.tick.sum())
+    else:
+        sim = simulation.SkyHopperSim(hitbox=hitbox, **params)
+        for seed in seeds:
+            score, episode_ticks = simulation.run_episode(sim, POLICIES[policy], seed, max_ticks)
+            scores[score] += 1
+            ticks += episode_ticks
+    return params, scores, ticks
+
+def percentile_from_histogram(histogram, total, pct):
+    target = pct / 100 * total
+    seen = 0
+    for score in sorted(histogram):
+        seen += histogram[score]
+        if seen >= target:
+            return score
+    return 0
+
+def summarize(params, histogram, ticks):
+    total = sum(histogram.values())
+    return {
+        **params,
+        "episodes": total,
+        "mean": sum(score * count for score, count in histogram.items()) / total if total else 0.0,
+        "p50": percentile_from_histogram(histogram, total, 50),
+        "p90": percentile_from_histogram(histogram, total, 90),
+        "p99": percentile_from_histogram(histogram, total, 99),
+        "max": max(histogram) if histogram else 0,
+        "mean_ticks": ticks / total if total else 0.0,
+        "histogram": {str(score): histogram[score] for score in sorted(histogram)},
+    }
+
+def param_grid(args):
+    values = [args.gravity, args.jump_strength, args.pipe_speed, args.gap_height, args.pipe_interval]
+    for combo in itertools.product(*values):
+        yield dict(zip(PARAMS, combo))
+
+def run(args, out=sys.stdout):
+    chunks = []
+    for params in param_grid(args):
+        for start in range(0, args.episodes, args.chunk):
+            seeds = list(range(args.seed + start, args.seed + min(start + args.chunk, args.episodes)))
+            chunks.append((params, seeds))
+    remaining = Counter()
+    for params, _ in chunks:
+        remaining[tuple(params.values())] += 1
+
+    histograms = {}
+    ticks = Counter()
+    results = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_chunk, params, args.policy, seeds, args.max_ticks, args.engine, args.hitbox)
+                   for params, seeds in chunks]
+        for future in as_completed(futures):
+            params, scores, chunk_ticks = future.result()
+            key = tuple(params.values())
+            histograms.setdefault(key, Counter()).update(scores)
+            ticks[key] += chunk_ticks
+            remaining[key] -= 1
+            if remaining[key] == 0:
+                summary = summarize(params, histograms[key], ticks[key])
+                results.append(summary)
+                out.write(json.dumps(summary) + "\n")
+                out.flush()
+
+    elapsed = time.perf_counter() - started
+    total_ticks = sum(ticks.values())
+    print(f"{len(results)} combinations, {total_ticks:,} steps in {elapsed:.1f} s "
+          f"({total_ticks / elapsed:,.0f} steps/sec, {args.workers or os.cpu_count()} workers)",
+          file=sys.stderr)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel headless Sky Hopper rollouts over a parameter grid")
+    parser.add_argument("--gravity", type=float, nargs="+", default=[simulation.GRAVITY])
+    parser.add_argument("--jump-strength", type=float, nargs="+", default=[simulation.JUMP_STRENGTH])
+    parser.add_argument("--pipe-speed", type=float, nargs="+", default=[simulation.PIPE_SPEEDS["NORMAL"]])
+    parser.add_argument("--gap-height", type=float, nargs="+", default=[simulation.PIPE_GAP])
+    parser.add_argument("--pipe-interval", type=int, nargs="+", default=[simulation.PIPE_INTERVAL_TICKS])
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="scripted")
+    parser.add_argument("--hitbox", choices=sorted(simulation.collision.HITBOXES), default="box",
+                        help="the game's bounding box, or a circle matching the round bird")
+    parser.add_argument("--episodes", type=int, default=1000, help="episodes per combination")
+    parser.add_argument("--chunk", type=int, default=250, help="episodes per work item")
+    parser.add_argument("--max-ticks", type=int, default=20000, help="cap on episode length")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--engine", choices=["batch", "scalar"],
+                        default="batch" if simulation.np is not None else "scalar")
+    parser.add_argument("--out", help="also write all summaries to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.engine == "batch" and simulation.np is None:
+        parser.error("--engine batch needs numpy")
+
+    results = run(args)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
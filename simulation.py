@@ -0,0 +1,412 @@
+# Sky Hopper game rules without pygame or a display.
+# Used by the game itself, and on its own for headless runs:
+#
+#     sim = SkyHopperSim()
+#     obs = sim.reset(seed=1)
+#     obs, reward, done = sim.step(jump)
+#
+# BatchSkyHopperSim runs N independent games in lockstep on NumPy arrays.
+import math
+import random
+from collections import deque
+
+import collision
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+GROUND_HEIGHT = 100
+
+GRAVITY = 0.5
+JUMP_STRENGTH = -10
+BIRD_RADIUS = 20
+
+PIPE_WIDTH = 80
+PIPE_GAP = 150
+PIPE_INTERVAL_TICKS = 90
+PIPE_SPEEDS = {"EASY": 2, "NORMAL": 3, "HARD": 4}
+PIPE_VARIANTS = 4
+
+PASS_REWARD = 1.0
+DEATH_REWARD = -1.0
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+# SplitMix64: a tiny RNG whose whole state is one 64-bit integer. The batch simulator
+# runs the same generator on uint64 arrays, so lane i with seed s draws exactly the
+# pipes SkyHopperSim draws with seed s.
+class SplitMix64:
+    def __init__(self, seed=0):
+        self.state = seed & MASK64
+
+    def seed(self, seed):
+        self.state = seed & MASK64
+
+    def next(self):
+        self.state = (self.state + GOLDEN_GAMMA) & MASK64
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def randint(self, a, b):
+        return a + self.next() % (b - a + 1)
+
+    def randrange(self, n):
+        return self.next() % n
+
+class Bird:
+    def __init__(self, x, y, gravity=GRAVITY, jump_strength=JUMP_STRENGTH, radius=BIRD_RADIUS):
+        self.x = x
+        self.y = y
+        self.prev_y = y
+        self.velocity = 0
+        self.gravity = gravity
+        self.jump_strength = jump_strength
+        self.radius = radius
+        self.alive = True
+        self.flap_frame = 0
+        self.flap_speed = 0.2
+        self.angle = 0
+
+    def update(self):
+        self.prev_y = self.y
+        self.velocity += self.gravity
+        self.y += self.velocity
+
+        self.angle = min(max(self.velocity * 3, -30), 90)
+
+        self.flap_frame += self.flap_speed
+        if self.flap_frame >= 3:
+            self.flap_frame = 0
+
+        if self.y < 0:
+            self.y = 0
+            self.velocity = 0
+
+    def jump(self):
+        self.velocity = self.jump_strength
+
+class Pipe:
+    def __init__(self, x, gap_y, speed, gap_height=PIPE_GAP, width=PIPE_WIDTH, variant=0):
+        self.x = x
+        self.prev_x = x
+        self.gap_y = gap_y
+        self.gap_height = gap_height
+        self.width = width
+        self.speed = speed
+        self.variant = variant
+        self.passed = False
+
+    def update(self):
+        self.prev_x = self.x
+        self.x -= self.speed
+
+
+class SkyHopperSim:
+    def __init__(self, pipe_speed=PIPE_SPEEDS["NORMAL"], gravity=GRAVITY, jump_strength=JUMP_STRENGTH,
+                 gap_height=PIPE_GAP, pipe_interval=PIPE_INTERVAL_TICKS,
+                 width=SCREEN_WIDTH, height=SCREEN_HEIGHT, bird_factory=Bird, pipe_factory=Pipe,
+                 hitbox="box"):
+        self.pipe_speed = pipe_speed
+        self.gravity = gravity
+        self.jump_strength = jump_strength
+        self.gap_height = gap_height
+        self.pipe_interval = pipe_interval
+        self.width = width
+        self.height = height
+        self.ground_y = height - GROUND_HEIGHT
+        self.bird_factory = bird_factory
+        self.pipe_factory = pipe_factory
+        # "box" is the game's rule; "circle" tests the round bird (see collision.py)
+        self.hitbox = hitbox
+        self.hits = collision.HITBOXES[hitbox]
+
+        self.rng = SplitMix64()
+        self.seed = None
+        self.bird = None
+        # Oldest first, which is also left to right
+        self.pipes = deque()
+        self.tick = 0
+        self.pipe_timer = 0
+        self.score = 0
+        self.done = True
+
+    def reset(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng.seed(seed)
+        self.bird = self.bird_factory(self.width // 3, self.height // 2, gravity=self.gravity,
+                                      jump_strength=self.jump_strength)
+        self.pipes.clear()
+        self.tick = 0
+        self.pipe_timer = -self.pipe_interval
+        self.score = 0
+        self.done = False
+        return self.observation()
+
+    def spawn_pipe(self):
+        gap_y = self.rng.randint(100, self.height - 200)
+        variant = self.rng.randrange(PIPE_VARIANTS)
+        self.pipes.append(self.pipe_factory(self.width, gap_y, self.pipe_speed, self.gap_height,
+                                            variant=variant))
+
+    def step(self, action):
+        if self.done:
+            return self.observation(), 0.0, True
+
+        bird = self.bird
+        if action:
+            bird.jump()
+        bird.update()
+
+        if self.tick - self.pipe_timer >= self.pipe_interval:
+            self.spawn_pipe()
+            self.pipe_timer = self.tick
+
+        reward = 0.0
+        pipes = self.pipes
+        for pipe in pipes:
+            pipe.update()
+
+            if not pipe.passed and pipe.x < bird.x:
+                pipe.passed = True
+                self.score += 1
+                reward += PASS_REWARD
+
+        # Pipes move left at one speed, so the ones that scrolled off are always at the front
+        while pipes and pipes[0].x < -pipes[0].width:
+            pipes.popleft()
+
+        for pipe in collision.near(pipes, bird.x - bird.radius, bird.x + bird.radius):
+            if self.hits(bird, pipe):
+                bird.alive = False
+                break
+
+        if bird.y > self.ground_y - bird.radius:
+            bird.alive = False
+
+        self.tick += 1
+        if not bird.alive:
+            self.done = True
+            reward += DEATH_REWARD
+        return self.observation(), reward, self.done
+
+    # (bird y, bird velocity, distance to the next pipe, top and bottom of its gap)
+    def observation(self):
+        bird = self.bird
+        if bird is None:
+            return (0.0, 0.0, float(self.width), 0.0, 0.0)
+        for pipe in self.pipes:
+            if pipe.x + pipe.width >= bird.x - bird.radius:
+                return (bird.y, bird.velocity, pipe.x - bird.x, pipe.gap_y, pipe.gap_y + pipe.gap_height)
+        center = self.height / 2
+        return (bird.y, bird.velocity, float(self.width), center - self.gap_height / 2,
+                center + self.gap_height / 2)
+
+# N games stepped together. Bird state is one array per field, pipes are (N, max_pipes)
+# ring buffers, and collisions are a single test over all lanes and pipes with the same
+# arithmetic as SkyHopperSim's hitbox. Finished lanes restart automatically with
+# the next seed of that lane; the seed every episode used is kept in episode_seeds.
+class BatchSkyHopperSim:
+    def __init__(self, num_envs, pipe_speed=PIPE_SPEEDS["NORMAL"], gravity=GRAVITY,
+                 jump_strength=JUMP_STRENGTH, gap_height=PIPE_GAP, pipe_interval=PIPE_INTERVAL_TICKS,
+                 width=SCREEN_WIDTH, height=SCREEN_HEIGHT, auto_reset=True, hitbox="box"):
+        if np is None:
+            raise ImportError("BatchSkyHopperSim requires numpy")
+        self.num_envs = num_envs
+        self.pipe_speed = pipe_speed
+        self.gravity = gravity
+        self.jump_strength = jump_strength
+        self.gap_height = gap_height
+        self.pipe_interval = pipe_interval
+        self.width = width
+        self.height = height
+        self.ground_y = height - GROUND_HEIGHT
+        self.auto_reset = auto_reset
+        if hitbox not in collision.HITBOXES:
+            raise KeyError(hitbox)
+        self.hitbox = hitbox
+
+        self.bird_x = width // 3
+        self.radius = BIRD_RADIUS
+        # Enough slots for every pipe that can be on screen at once
+        self.max_pipes = int(math.ceil((width + 2 * PIPE_WIDTH) / max(pipe_speed * pipe_interval, 1))) + 1
+
+        n, p = num_envs, self.max_pipes
+        self.bird_y = np.zeros(n)
+        self.bird_vy = np.zeros(n)
+        self.pipe_x = np.zeros((n, p))
+        self.pipe_gap = np.zeros((n, p))
+        self.pipe_active = np.zeros((n, p), np.bool_)
+        self.pipe_passed = np.zeros((n, p), np.bool_)
+        self.pipe_head = np.zeros(n, np.int64)
+        self.tick = np.zeros(n, np.int64)
+        self.pipe_timer = np.zeros(n, np.int64)
+        self.score = np.zeros(n, np.int64)
+        self.rng_state = np.zeros(n, np.uint64)
+        self.lane_seeds = np.zeros(n, np.uint64)
+        self.episode = np.zeros(n, np.int64)
+        self.episode_seeds = np.zeros(n, np.uint64)
+        self.final_scores = np.zeros(n, np.int64)
+        self.final_ticks = np.zeros(n, np.int64)
+        self.done = np.ones(n, np.bool_)
+        self.lanes = np.arange(n)
+
+    def next_random(self, mask):
+        state = self.rng_state[mask] + np.uint64(GOLDEN_GAMMA)
+        self.rng_state[mask] = state
+        z = (state ^ (state >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+    def reset_lanes(self, mask, seeds):
+        self.episode_seeds[mask] = seeds
+        self.rng_state[mask] = seeds
+        self.bird_y[mask] = self.height // 2
+        self.bird_vy[mask] = 0
+        self.pipe_active[mask] = False
+        self.pipe_passed[mask] = False
+        self.pipe_head[mask] = 0
+        self.tick[mask] = 0
+        self.pipe_timer[mask] = -self.pipe_interval
+        self.score[mask] = 0
+        self.done[mask] = False
+
+    # seed is either one base seed (lane i gets seed + i) or a sequence with one seed per lane
+    def reset(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(63)
+        if np.ndim(seed) == 0:
+            seeds = (np.uint64(seed) + np.arange(self.num_envs, dtype=np.uint64))
+        else:
+            seeds = np.asarray(seed, dtype=np.uint64)
+        self.lane_seeds[:] = seeds
+        self.episode[:] = 0
+        self.reset_lanes(np.ones(self.num_envs, np.bool_), seeds)
+        return self.observation()
+
+    def step(self, actions):
+        live = ~self.done
+        jump = np.asarray(actions, np.bool_) & live
+
+        vy = np.where(jump, float(self.jump_strength), self.bird_vy)
+        vy = np.where(live, vy + self.gravity, vy)
+        y = np.where(live, self.bird_y + vy, self.bird_y)
+        above = y < 0
+        y[above] = 0
+        vy[above] = 0
+        self.bird_y = y
+        self.bird_vy = vy
+
+        spawn = live & (self.tick - self.pipe_timer >= self.pipe_interval)
+        if spawn.any():
+            lanes = self.lanes[spawn]
+            slots = self.pipe_head[spawn]
+            span = np.uint64(self.height - 300 + 1)
+            gaps = 100 + (self.next_random(spawn) % span).astype(np.int64)
+            self.next_random(spawn)  # pipe color variant, drawn to stay in step with SkyHopperSim
+            self.pipe_x[lanes, slots] = self.width
+            self.pipe_gap[lanes, slots] = gaps
+            self.pipe_active[lanes, slots] = True
+            self.pipe_passed[lanes, slots] = False
+            self.pipe_head[spawn] = (slots + 1) % self.max_pipes
+            self.pipe_timer[spawn] = self.tick[spawn]
+
+        moving = self.pipe_active & live[:, None]
+        self.pipe_x -= np.where(moving, self.pipe_speed, 0)
+        x = self.pipe_x
+
+        passed_now = moving & ~self.pipe_passed & (x < self.bird_x)
+        self.pipe_passed |= passed_now
+        passes = passed_now.sum(axis=1)
+        self.score += passes
+
+        if self.hitbox == "circle":
+            hit = self.circle_hits(y, x)
+        else:
+            hit = self.box_hits(y, x)
+        crashed = (moving & hit).any(axis=1)
+        crashed |= y > self.ground_y - self.radius
+        crashed &= live
+
+        self.pipe_active &= ~(moving & (x < -PIPE_WIDTH))
+        self.tick += live
+
+        rewards = passes * PASS_REWARD + crashed * DEATH_REWARD
+        dones = crashed
+        self.done |= crashed
+
+        if crashed.any():
+            self.final_scores[crashed] = self.score[crashed]
+            self.final_ticks[crashed] = self.tick[crashed]
+            if self.auto_reset:
+                self.episode[crashed] += 1
+                seeds = self.lane_seeds[crashed] + self.episode[crashed].astype(np.uint64) * np.uint64(GOLDEN_GAMMA)
+                self.reset_lanes(crashed, seeds)
+        return self.observation(), rewards, dones
+
+    # collision.box_hits_pipe for every lane and pipe slot
+    def box_hits(self, y, x):
+        left = int(self.bird_x - self.radius)
+        size = int(self.radius * 2)
+        top = np.trunc(y - self.radius)[:, None]
+        pipe_left = np.trunc(x)
+        overlap_x = (left < pipe_left + PIPE_WIDTH) & (pipe_left < left + size)
+        gap_top = np.trunc(self.pipe_gap)
+        hit = (top < gap_top) & (gap_top > 0)
+        hit |= top + size > np.trunc(self.pipe_gap + self.gap_height)
+        return overlap_x & hit
+
+    # collision.circle_hits_pipe for every lane and pipe slot
+    def circle_hits(self, y, x):
+        bird_x = self.bird_x
+        y = y[:, None]
+        dx = bird_x - np.minimum(np.maximum(bird_x, x), x + PIPE_WIDTH)
+        dx2 = dx * dx
+        limit = self.radius * self.radius
+        gap_top = self.pipe_gap
+        above = np.maximum(y - gap_top, 0)
+        below = np.minimum(y - (gap_top + self.gap_height), 0)
+        hit = (dx2 + above * above < limit) & (gap_top > 0)
+        hit |= dx2 + below * below < limit
+        return hit
+
+    # One row per lane, same columns as SkyHopperSim.observation()
+    def observation(self):
+        ahead = self.pipe_active & (self.pipe_x + PIPE_WIDTH >= self.bird_x - self.radius)
+        masked_x = np.where(ahead, self.pipe_x, np.inf)
+        nearest = masked_x.argmin(axis=1)
+        has_pipe = ahead[self.lanes, nearest]
+        gap = self.pipe_gap[self.lanes, nearest]
+        center = self.height / 2
+        obs = np.empty((self.num_envs, 5))
+        obs[:, 0] = self.bird_y
+        obs[:, 1] = self.bird_vy
+        obs[:, 2] = np.where(has_pipe, self.pipe_x[self.lanes, nearest] - self.bird_x, float(self.width))
+        obs[:, 3] = np.where(has_pipe, gap, center - self.gap_height / 2)
+        obs[:, 4] = np.where(has_pipe, gap + self.gap_height, center + self.gap_height / 2)
+        return obs
+
+# Vectorized scripted_policy for BatchSkyHopperSim observations
+def scripted_policy_batch(obs, margin=4, floor=SCREEN_HEIGHT - GROUND_HEIGHT):
+    y, velocity, gap_bottom = obs[:, 0], obs[:, 1], obs[:, 4]
+    return (velocity >= 0) & (y + velocity > np.minimum(gap_bottom, floor) - margin - BIRD_RADIUS)
+
+# Jump when the bird is falling towards the bottom of the next gap (or the ground)
+def scripted_policy(obs, margin=4, floor=SCREEN_HEIGHT - GROUND_HEIGHT):
+    y, velocity, dx, gap_top, gap_bottom = obs
+    return velocity >= 0 and y + velocity > min(gap_bottom, floor) - margin - BIRD_RADIUS
+
+def run_episode(sim, policy=scripted_policy, seed=None, max_ticks=100000):
+    obs = sim.reset(seed)
+    done = False
+    while not done and sim.tick < max_ticks:
+        obs, reward, done = sim.step(policy(obs))
+    return sim.score, sim.tick
@@ -0,0 +1,660 @@
+# Save storage for Sky Hopper.
+# Writes happen on a background thread so the game loop never waits on the disk,
+# and every file is replaced atomically so a crash can't leave a half-written save.
+import os
+import sys
+import json
+import heapq
+import tempfile
+import time
+import threading
+import urllib.parse
+from array import array
+from collections import OrderedDict
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+def fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# Write to a temp file in the same directory, fsync it, then rename it over the target.
+# With backup=True the previous version is kept next to it as <path>.bak.
+def atomic_write(path, data, backup=False):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if backup and os.path.exists(path):
+            os.replace(path, path + ".bak")
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+
+def atomic_write_json(path, obj, backup=False):
+    atomic_write(path, json.dumps(obj).encode("utf-8"), backup)
+
+# Load a JSON save, falling back to the .bak copy if the main file is missing or unreadable
+def load_json(path):
+    for candidate in (path, path + ".bak"):
+        if not os.path.exists(candidate):
+            continue
+        try:
+            with open(candidate, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read save file {candidate}: {e}", file=sys.stderr)
+    return None
+
+# Runs write jobs on one background thread, in submission order. Jobs submitted with
+# the same key replace each other while they are still waiting, and the thread waits
+# `delay` seconds after waking so a burst of saves turns into one write.
+class BackgroundWriter:
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.pending = OrderedDict()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.busy = False
+        self.closed = False
+        # Callers blocked in flush(); while there are any the writer skips its delay
+        self.flushing = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def submit(self, job, key=None):
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("writer is closed")
+            if key is None:
+                key = object()
+            if key in self.pending:
+                self.coalesced += 1
+            self.pending[key] = job
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="save-writer", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending and self.closed:
+                    return
+                if not self.closed and self.delay:
+                    self.cond.wait_for(lambda: self.closed or self.flushing, self.delay)
+                jobs = list(self.pending.values())
+                self.pending.clear()
+                self.busy = True
+
+            for job in jobs:
+                try:
+                    job()
+                    self.writes += 1
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Save failed: {e}", file=sys.stderr)
+
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()
+
+    # Block until everything submitted so far has been written
+    def flush(self, timeout=None):
+        with self.cond:
+            if self.thread is None:
+                return True
+            self.flushing += 1
+            try:
+                self.cond.notify_all()
+                return self.cond.wait_for(lambda: not self.pending and not self.busy, timeout)
+            finally:
+                self.flushing -= 1
+
+    def close(self, timeout=None):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+# Progression store: a JSON snapshot plus an append-only journal of small records.
+# Every change is one line appended to <path>.journal; once the journal grows past
+# `journal_limit` bytes the writer thread folds it into a fresh snapshot and empties it.
+# Records hold absolute values ("set coins to 140", "unlock Golden"). A compaction
+# appends the records still buffered to the journal before it replaces the snapshot,
+# so the journal's last value for a key always matches the snapshot and replaying it
+# over the snapshot is harmless even if the journal was never emptied.
+# The "default" profile keeps its files at `path`; any other profile gets its own
+# snapshot, journal and run history next to it (flappy_bird_save.alice.json, ...).
+class JournalStore:
+    def __init__(self, path, defaults, writer, journal_limit=64 * 1024, profile="default"):
+        self.base_path = path
+        self.defaults = defaults
+        self.writer = writer
+        self.journal_limit = journal_limit
+        self.use_profile(profile)
+        self.data = {}
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.journal_size = 0
+        self.damaged = False
+
+    def profile_path(self, name):
+        if name == "default":
+            return self.base_path
+        root, ext = os.path.splitext(self.base_path)
+        # Quoted so any name maps to its own file name, and only to that one
+        return f"{root}.{urllib.parse.quote(name, safe='')}{ext}"
+
+    def use_profile(self, name):
+        self.profile = name
+        self.path = self.profile_path(name)
+        self.journal_path = self.path + ".journal"
+        self.runs_path = self.path + ".runs"
+        self.run_offsets = None
+        self.runs_size = 0
+        self.top_cache = None
+
+    def load(self):
+        self.read()
+        # Rewrite a damaged journal into the snapshot so new records never land after garbage
+        if self.damaged or self.journal_size > self.journal_limit:
+            self.compact()
+        return self.data
+
+    # Snapshot + journal replay without writing anything back
+    def read(self):
+        self.data = json.loads(json.dumps(self.defaults))
+        self.journal_size = 0
+        snapshot = load_json(self.path)
+        if isinstance(snapshot, dict):
+            self.data.update(snapshot)
+        elif snapshot is not None:
+            print(f"Ignoring save file {self.path}: expected an object", file=sys.stderr)
+
+        self.damaged = False
+        try:
+            with open(self.journal_path, "rb") as f:
+                lines = f.read().split(b"\n")
+        except FileNotFoundError:
+            lines = []
+        except OSError as e:
+            print(f"Could not read journal {self.journal_path}: {e}", file=sys.stderr)
+            lines = []
+
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            self.journal_size += len(line) + 1
+            try:
+                self.apply(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                # A torn last line is expected after a crash mid-append; anything else is worth a warning
+                self.damaged = True
+                if line_no != len(lines):
+                    print(f"Skipping bad journal record {line_no}: {e}", file=sys.stderr)
+        return self.data
+
+    def apply(self, record):
+        op = record["op"]
+        if op == "set":
+            self.data[record["key"]] = record["value"]
+        elif op == "unlock":
+            unlocked = self.data.setdefault(record["key"], [])
+            if record["value"] not in unlocked:
+                unlocked.append(record["value"])
+        else:
+            raise ValueError(f"unknown op {op!r}")
+
+    def record(self, op, key, value):
+        entry = {"op": op, "key": key, "value": value}
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.apply(entry)
+            self.buffer.append(line)
+            self.journal_size += len(line)
+            compact = self.journal_size > self.journal_limit
+        self.writer.submit(self.write_journal, key=self.journal_path)
+        if compact:
+            self.compact()
+
+    # Record a value only if it differs from what is stored
+    def set(self, key, value):
+        if self.data.get(key) != value:
+            self.record("set", key, value)
+
+    def unlock(self, key, value):
+        if value not in self.data.get(key, ()):
+            self.record("unlock", key, value)
+
+    # Runs on the writer thread
+    def write_journal(self):
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+        if not lines:
+            return
+        with open(self.journal_path, "ab") as f:
+            f.write("".join(lines).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self):
+        with self.lock:
+            self.journal_size = 0
+        self.writer.submit(self.write_snapshot, key=self.path)
+
+    # Runs on the writer thread. Records still buffered are part of the snapshot, but
+    # they go into the old journal first: a crash before the truncate would otherwise
+    # replay older journal values over the newer snapshot.
+    def write_snapshot(self):
+        with self.lock:
+            data = json.dumps(self.data).encode("utf-8")
+            lines, self.buffer = self.buffer, []
+        if lines:
+            with open(self.journal_path, "ab") as f:
+                # The leading newline keeps a torn last record from swallowing the first one
+                f.write(("\n" + "".join(lines)).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        atomic_write(self.path, data, backup=True)
+        with open(self.journal_path, "wb") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        fsync_directory(os.path.dirname(os.path.abspath(self.journal_path)))
+
+    # Load (creating on first write) another profile's files and make them current.
+    # Writes already queued still go to the old profile's files, so they are flushed first.
+    def switch_profile(self, name):
+        self.writer.flush()
+        self.use_profile(name)
+        return self.load()
+
+    # Run history lives in <path>.runs, one JSON line per run; a run's id is its line number.
+    # The file is indexed by line offsets on first use, so pages are read with a seek.
+    # A torn last line left by a crash mid-append is cut off here, before the next append
+    # could glue a new record onto it.
+    def index_runs(self):
+        if self.run_offsets is not None:
+            return
+        self.run_offsets = array("q")
+        offset = 0
+        try:
+            with open(self.runs_path, "rb+") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        f.truncate(offset)
+                        break
+                    self.run_offsets.append(offset)
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+        self.runs_size = offset
+
+    # None for a line that isn't a valid run record
+    def parse_run(self, line, run_id):
+        try:
+            run = json.loads(line)
+        except ValueError:
+            print(f"Skipping bad run record {run_id} in {self.runs_path}", file=sys.stderr)
+            return None
+        if not isinstance(run, dict):
+            return None
+        run["id"] = run_id
+        return run
+
+    def iter_runs(self):
+        try:
+            with open(self.runs_path, "rb") as f:
+                for run_id, line in enumerate(f):
+                    if line.endswith(b"\n"):
+                        run = self.parse_run(line, run_id)
+                        if run is not None:
+                            yield run
+        except FileNotFoundError:
+            return
+
+    def record_run(self, run):
+        self.index_runs()
+        line = (json.dumps(run, separators=(",", ":")) + "\n").encode("utf-8")
+        self.run_offsets.append(self.runs_size)
+        self.runs_size += len(line)
+        self.writer.submit(lambda: self.append_run(line))
+        self.top_cache = None
+        return dict(run, id=len(self.run_offsets) - 1)
+
+    def append_run(self, line):
+        with open(self.runs_path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # One pass over the file serves every mode; the result is only used to seed a Leaderboard
+    def top_runs(self, mode, limit):
+        if self.top_cache is None or self.top_cache[0] != limit:
+            self.index_runs()
+            self.writer.flush()
+            heaps = {}
+            for run in self.iter_runs():
+                heap = heaps.setdefault(run["mode"], [])
+                entry = (run["score"], -run["id"], run)
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif entry[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, entry)
+            self.top_cache = (limit, {m: [e[2] for e in sorted(h, reverse=True, key=lambda e: e[:2])]
+                                      for m, h in heaps.items()})
+        return self.top_cache[1].get(mode, [])
+
+    def run_count(self):
+        self.index_runs()
+        return len(self.run_offsets)
+
+    # Newest first; pass the id of the last run on the previous page as `before`
+    def runs_page(self, before=None, limit=8):
+        self.index_runs()
+        self.writer.flush()
+        end = len(self.run_offsets) if before is None else max(0, min(before, len(self.run_offsets)))
+        page = []
+        if end == 0:
+            return page
+        with open(self.runs_path, "rb") as f:
+            for run_id in range(end - 1, max(-1, end - 1 - limit), -1):
+                f.seek(self.run_offsets[run_id])
+                run = self.parse_run(f.readline(), run_id)
+                if run is not None:
+                    page.append(run)
+        return page
+
+    def clear_runs(self):
+        self.top_cache = None
+        self.run_offsets = array("q")
+        self.runs_size = 0
+        self.writer.submit(lambda: atomic_write(self.runs_path, b""))
+
+    def close(self):
+        pass
+
+# Multi-profile store in a SQLite database. The game thread reads through its own
+# connection and every write goes through the writer thread's connection; WAL mode
+# lets the two run side by side. A profile's values are exposed as the same dict
+# shape JournalStore uses, so the game doesn't care which backend it has.
+class SqliteStore:
+    SCHEMA_VERSION = 1
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            coins INTEGER NOT NULL,
+            highscore INTEGER NOT NULL,
+            equipped_skin TEXT NOT NULL,
+            created REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS unlocks (
+            profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+            skin TEXT NOT NULL,
+            PRIMARY KEY (profile_id, skin)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS settings (
+            profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (profile_id, key)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+            mode TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            skin TEXT NOT NULL,
+            theme TEXT NOT NULL,
+            duration_ticks INTEGER NOT NULL,
+            ts REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS profiles_last_used ON profiles (last_used DESC);
+        CREATE INDEX IF NOT EXISTS runs_mode_score ON runs (mode, score DESC);
+        CREATE INDEX IF NOT EXISTS runs_profile_mode_score ON runs (profile_id, mode, score DESC);
+        -- Index entries are ordered by (profile_id, rowid), which serves newest-first history pages
+        CREATE INDEX IF NOT EXISTS runs_profile ON runs (profile_id);
+    """
+    # Keys stored as columns of profiles; everything else except unlocks goes in settings
+    PROFILE_COLUMNS = ("coins", "highscore", "equipped_skin")
+
+    def __init__(self, path, defaults, writer, profile="default", migrate_from=None):
+        self.path = path
+        self.defaults = defaults
+        self.writer = writer
+        self.profile = profile
+        self.migrate_from = migrate_from
+        self.profile_id = None
+        self.data = {}
+        self.conn = None
+        self.write_conn = None
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def load(self):
+        if self.conn is None:
+            self.conn = self.connect()
+            with self.conn:
+                self.conn.executescript(self.SCHEMA)
+                self.conn.execute("PRAGMA user_version=%d" % self.SCHEMA_VERSION)
+            self.migrate()
+        return self.switch_profile(self.profile)
+
+    # One-time import of the old JSON save (snapshot + journal) into the "default" profile
+    def migrate(self):
+        if not self.migrate_from:
+            return
+        done = self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone()
+        if done:
+            return
+        if os.path.exists(self.migrate_from):
+            old = JournalStore(self.migrate_from, self.defaults, None).read()
+            with self.conn:
+                self.create_profile(self.conn, "default", old)
+            print(f"Migrated {self.migrate_from} into {self.path}", file=sys.stderr)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_json', ?)",
+                              (str(time.time()),))
+
+    def create_profile(self, conn, name, data):
+        now = time.time()
+        cursor = conn.execute(
+            "INSERT INTO profiles (name, coins, highscore, equipped_skin, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, data["coins"], data["highscore"], data["equipped_skin"], now, now))
+        profile_id = cursor.lastrowid
+        conn.executemany("INSERT OR IGNORE INTO unlocks (profile_id, skin) VALUES (?, ?)",
+                         [(profile_id, skin) for skin in data["unlocked_skins"]])
+        conn.executemany("INSERT INTO settings (profile_id, key, value) VALUES (?, ?, ?)",
+                         [(profile_id, key, json.dumps(value)) for key, value in data.items()
+                          if key not in self.PROFILE_COLUMNS and key != "unlocked_skins"])
+        return profile_id
+
+    # Load (creating if needed) a profile and make it the one set()/unlock() write to.
+    # Pending writes are flushed first so switching back to a profile sees its latest state.
+    def switch_profile(self, name):
+        self.writer.flush()
+        row = self.conn.execute("SELECT id FROM profiles WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            with self.conn:
+                profile_id = self.create_profile(self.conn, name, self.defaults)
+        else:
+            profile_id = row[0]
+
+        data = json.loads(json.dumps(self.defaults))
+        coins, highscore, equipped = self.conn.execute(
+            "SELECT coins, highscore, equipped_skin FROM profiles WHERE id = ?", (profile_id,)).fetchone()
+        data.update(coins=coins, highscore=highscore, equipped_skin=equipped)
+        data["unlocked_skins"] = [skin for (skin,) in self.conn.execute(
+            "SELECT skin FROM unlocks WHERE profile_id = ?", (profile_id,))]
+        for key, value in self.conn.execute("SELECT key, value FROM settings WHERE profile_id = ?", (profile_id,)):
+            data[key] = json.loads(value)
+
+        self.profile = name
+        self.profile_id = profile_id
+        self.data = data
+        self.submit(("touch", profile_id), "UPDATE profiles SET last_used = ? WHERE id = ?", (time.time(), profile_id))
+        return data
+
+    def profiles(self, limit=50):
+        return [name for (name,) in self.conn.execute(
+            "SELECT name FROM profiles ORDER BY last_used DESC LIMIT ?", (limit,))]
+
+    def submit(self, key, sql, params):
+        self.writer.submit(lambda: self.execute(sql, params), key=key)
+
+    # Runs on the writer thread, which owns write_conn
+    def execute(self, sql, params):
+        if self.write_conn is None:
+            self.write_conn = self.connect()
+        with self.write_conn:
+            self.write_conn.execute(sql, params)
+
+    def set(self, key, value):
+        if self.data.get(key) == value:
+            return
+        self.data[key] = value
+        if key in self.PROFILE_COLUMNS:
+            sql = "UPDATE profiles SET %s = ? WHERE id = ?" % key
+            params = (value, self.profile_id)
+        else:
+            sql = "INSERT OR REPLACE INTO settings (profile_id, key, value) VALUES (?, ?, ?)"
+            params = (self.profile_id, key, json.dumps(value))
+        self.submit((self.profile_id, key), sql, params)
+
+    def unlock(self, key, value):
+        unlocked = self.data.setdefault(key, [])
+        if value in unlocked:
+            return
+        unlocked.append(value)
+        self.submit(None, "INSERT OR IGNORE INTO unlocks (profile_id, skin) VALUES (?, ?)", (self.profile_id, value))
+
+    def record_run(self, run):
+        self.submit(None, "INSERT INTO runs (profile_id, mode, score, skin, theme, duration_ticks, ts) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.profile_id, run["mode"], run["score"], run["skin"], run["theme"],
+                     run["duration_ticks"], run["ts"]))
+        return run
+
+    RUN_COLUMNS = ("id", "mode", "score", "skin", "theme", "duration_ticks", "ts")
+
+    def top_runs(self, mode, limit):
+        self.writer.flush()
+        rows = self.conn.execute(
+            "SELECT id, mode, score, skin, theme, duration_ticks, ts FROM runs "
+            "WHERE profile_id = ? AND mode = ? ORDER BY score DESC, id ASC LIMIT ?", (self.profile_id, mode, limit))
+        return [dict(zip(self.RUN_COLUMNS, row)) for row in rows]
+
+    def run_count(self):
+        self.writer.flush()
+        return self.conn.execute("SELECT COUNT(*) FROM runs WHERE profile_id = ?", (self.profile_id,)).fetchone()[0]
+
+    # Newest first, keyset-paginated: pass the id of the last run on the previous page as `before`
+    def runs_page(self, before=None, limit=8):
+        self.writer.flush()
+        if before is None:
+            before = 2 ** 63 - 1
+        rows = self.conn.execute(
+            "SELECT id, mode, score, skin, theme, duration_ticks, ts FROM runs "
+            "WHERE profile_id = ? AND id < ? ORDER BY id DESC LIMIT ?", (self.profile_id, before, limit))
+        return [dict(zip(self.RUN_COLUMNS, row)) for row in rows]
+
+    def clear_runs(self):
+        self.submit(None, "DELETE FROM runs WHERE profile_id = ?", (self.profile_id,))
+
+    def close(self):
+        def close_write_conn():
+            if self.write_conn is not None:
+                self.write_conn.close()
+                self.write_conn = None
+        self.writer.submit(close_write_conn)
+        self.writer.flush()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+# SQLite when the interpreter has it, otherwise the JSON snapshot + journal store
+def open_store(db_path, json_path, defaults, writer, profile="default"):
+    if sqlite3 is not None:
+        return SqliteStore(db_path, defaults, writer, profile, migrate_from=json_path)
+    return JournalStore(json_path, defaults, writer, profile=profile)
+
+# Best K runs per mode. Each mode keeps a min-heap of its K best, so recording a run is
+# O(log K) and the HIGHSCORE screen never has to look at the full history.
+class Leaderboard:
+    def __init__(self, k=10):
+        self.k = k
+        self.heaps = {}
+        self.ranked = {}
+        self.seq = 0
+
+    def load(self, store, modes):
+        self.heaps.clear()
+        self.ranked.clear()
+        for mode in modes:
+            self.heaps[mode] = []
+            for run in store.top_runs(mode, self.k):
+                self.add(run)
+
+    # Returns True if the run made it onto the board. On equal scores the older run stays ahead.
+    def add(self, run):
+        heap = self.heaps.setdefault(run["mode"], [])
+        self.seq += 1
+        entry = (run["score"], -self.seq, run)
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+        else:
+            return False
+        self.ranked.pop(run["mode"], None)
+        return True
+
+    def top(self, mode):
+        ranked = self.ranked.get(mode)
+        if ranked is None:
+            ranked = [entry[2] for entry in sorted(self.heaps.get(mode, ()), reverse=True, key=lambda e: e[:2])]
+            self.ranked[mode] = ranked
+        return ranked
+
+    def best(self, mode):
+        heap = self.heaps.get(mode)
+        return max(entry[0] for entry in heap) if heap else 0
+
+    def clear(self):
+        for heap in self.heaps.values():
+            heap.clear()
+        self.ranked.clear()